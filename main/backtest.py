@@ -0,0 +1,224 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import complete_rows
+from vix_index import identify_vix_peaks, load_data
+
+RESULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'result')
+# Default rule grid: tranche trigger levels, up to MAX_TRANCHES per rule
+VIX_LEVELS = [0, 15, 20, 25, 30, 35, 40, 50]
+PERCENTILE_LEVELS = [0.5, 0.7, 0.8, 0.9, 0.95]
+MAX_TRANCHES = 3
+COOLDOWNS = [0, 5, 20, 60]
+# Rows after which a waiting tranche is bought anyway; 0 waits for the trigger forever
+MAX_WAITS = [60, 250, 0]
+# Rows between contributions (20 = monthly)
+CONTRIBUTION_INTERVAL = 20
+# Column each trigger compares with its levels
+TRIGGERS = {'vix': 'VIX', 'percentile': 'VIX_percentile_1y'}
+# Rules scored per task
+CHUNK_SIZE = 100
+# Rows on each side a VIX local peak must exceed (identify_vix_peaks window); a peak is only
+# known this many rows after it, which is where its cooldown starts
+PEAK_WINDOW = 20
+
+# Per-process inputs shared by every chunk, set by _init_worker
+_state = {}
+
+
+def rule_grid(vix_levels=VIX_LEVELS, percentile_levels=PERCENTILE_LEVELS, max_tranches=MAX_TRANCHES,
+              cooldowns=COOLDOWNS, max_waits=MAX_WAITS):
+    """Every rule variant: trigger, tranche levels, cooldown and max wait
+
+    A rule splits each contribution into equal tranches, one per level. A
+    tranche is bought on the first row at or after the contribution where
+    the trigger column is at or above its level, outside the cooldown rows
+    that start when each VIX local peak is confirmed (PEAK_WINDOW rows after
+    it), or after max_wait rows at the latest.
+    """
+    tranche_sets = [('vix', levels) for k in range(1, max_tranches + 1)
+                    for levels in itertools.combinations(vix_levels, k)]
+    tranche_sets += [('percentile', levels) for k in range(1, max_tranches + 1)
+                     for levels in itertools.combinations(percentile_levels, k)]
+    return pd.DataFrame([(trigger, levels, cooldown, max_wait)
+                         for (trigger, levels), cooldown, max_wait in itertools.product(tranche_sets, cooldowns, max_waits)],
+                        columns=['trigger', 'levels', 'cooldown', 'max_wait'])
+
+
+def next_true(mask):
+    """For each row, the first row at or after it where mask is True (len(mask) if none)"""
+    n = len(mask)
+    positions = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(positions[::-1])[::-1]
+
+
+def cooldown_mask(peaks, cooldown):
+    """Rows within `cooldown` rows from a flagged row, the flagged row included"""
+    n = len(peaks)
+    steps = np.zeros(n + 1, dtype=np.int64)
+    if cooldown > 0:
+        starts = np.flatnonzero(peaks)
+        np.add.at(steps, starts, 1)
+        np.add.at(steps, np.minimum(starts + cooldown, n), -1)
+    return np.cumsum(steps[:n]) > 0
+
+
+def _irr(contributions, years, final_value, iterations=100):
+    """Annual money-weighted return of each rule, by bisection on all rules at once
+
+    Solves sum(contributions * (1 + r) ** years) = final_value, with years
+    from each contribution to the end.
+    """
+    low = np.full(len(final_value), -0.99)
+    high = np.full(len(final_value), 10.0)
+    for _ in range(iterations):
+        rate = (low + high) / 2
+        too_high = (contributions * (1 + rate[:, None]) ** years).sum(axis=1) > final_value
+        high = np.where(too_high, rate, high)
+        low = np.where(too_high, low, rate)
+    return (low + high) / 2
+
+
+def _init_worker(prices, signals, peaks, years, interval):
+    """Price path and trigger columns, once per process"""
+    n = len(prices)
+    contribution_rows = np.arange(0, n, interval)
+    _state.update(prices=prices, signals=signals, peaks=peaks, n=n, contribution_rows=contribution_rows,
+                  years=years[contribution_rows], returns=np.diff(prices) / prices[:-1], allowed={})
+
+
+def _next_allowed(trigger, level, cooldown):
+    """First row at or after each row where a tranche with this trigger level may be bought"""
+    key = (trigger, level, cooldown)
+    if key not in _state['allowed']:
+        with np.errstate(invalid='ignore'):
+            mask = _state['signals'][trigger] >= level
+        if cooldown > 0:
+            mask &= ~cooldown_mask(_state['peaks'], cooldown)
+        _state['allowed'][key] = next_true(mask)
+    return _state['allowed'][key]
+
+
+def _score_chunk(rules):
+    """Metrics of a list of (trigger, levels, cooldown, max_wait) rules
+
+    Each rule's purchases are one bincount over its tranches' buy rows; the
+    portfolio paths of all rules in the chunk are then computed together as
+    (rules x rows) arrays.
+    """
+    n, prices, rows = _state['n'], _state['prices'], _state['contribution_rows']
+    edges, amounts = [], []
+    for i, (trigger, levels, cooldown, max_wait) in enumerate(rules):
+        for level in levels:
+            buy = _next_allowed(trigger, level, cooldown)[rows]
+            if max_wait > 0:
+                buy = np.minimum(buy, rows + max_wait)
+            # Column n collects tranches never bought
+            edges.append(np.minimum(buy, n) + i * (n + 1))
+            amounts.append(np.full(len(rows), 1.0 / len(levels)))
+    spent = np.bincount(np.concatenate(edges), np.concatenate(amounts),
+                        minlength=len(rules) * (n + 1)).reshape(len(rules), n + 1)[:, :n]
+
+    contributed = np.zeros(n)
+    contributed[rows] = 1.0
+    cash = np.cumsum(contributed) - np.cumsum(spent, axis=1)
+    stock = np.cumsum(spent / prices, axis=1) * prices
+    value = stock + cash
+
+    # Time-weighted return: each row earns the S&P 500 return on the share invested the row before
+    exposure = stock / value
+    nav = np.cumprod(np.hstack([np.ones((len(rules), 1)), 1 + exposure[:, :-1] * _state['returns']]), axis=1)
+    drawdown = nav / np.maximum.accumulate(nav, axis=1) - 1
+
+    return {
+        'cagr': _irr(np.ones(len(rows)), _state['years'], value[:, -1]),
+        'max_drawdown': drawdown.min(axis=1),
+        'time_in_market': exposure.mean(axis=1),
+        'final_multiple': value[:, -1] / len(rows),
+        'uninvested_share': cash[:, -1] / len(rows)
+    }
+
+
+def run_backtest(data, rules=None, interval=CONTRIBUTION_INTERVAL, workers=None, peak_window=PEAK_WINDOW):
+    """Score VIX-triggered dollar-cost averaging rules on the S&P 500
+
+    `data` has SP500, VIX, VIX_percentile_1y and is_local_peak (added with
+    identify_vix_peaks(window=peak_window) when missing); rows without an S&P 500 price are left
+    out. A contribution of 1 arrives every `interval` rows and is split
+    over the rule's tranches (see rule_grid, the default rules). Chunks of
+    rules run in worker processes. Returns the rules with their
+    money-weighted annual return (cagr), maximum drawdown of the
+    time-weighted portfolio value, average share invested (time_in_market),
+    final value per unit contributed and share still in cash at the end.
+
+    is_local_peak looks `peak_window` rows ahead, so each cooldown starts
+    `peak_window` rows after its peak, on the first row the peak is known.
+    """
+    if rules is None:
+        rules = rule_grid()
+    if 'is_local_peak' not in data:
+        data = identify_vix_peaks(data, window=peak_window)
+    rows = complete_rows(data, ['SP500'])
+    dates = data.index[rows]
+    signals = {trigger: data[column].to_numpy(dtype=float)[rows] for trigger, column in TRIGGERS.items()}
+    years = (dates[-1] - dates).days.to_numpy() / 365.25
+    # Peaks as of the row they are confirmed on
+    peaks = data['is_local_peak'].to_numpy(dtype=bool)[rows]
+    confirmed = np.zeros_like(peaks)
+    confirmed[peak_window:] = peaks[:len(peaks) - peak_window]
+    initargs = (data['SP500'].to_numpy(dtype=float)[rows], signals, confirmed, years, interval)
+
+    items = list(rules[['trigger', 'levels', 'cooldown', 'max_wait']].itertuples(index=False, name=None))
+    chunks = [items[start:start + CHUNK_SIZE] for start in range(0, len(items), CHUNK_SIZE)]
+    if workers == 1:
+        _init_worker(*initargs)
+        parts = [_score_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            parts = list(pool.map(_score_chunk, chunks))
+
+    metrics = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]} if parts else {}
+    return rules.reset_index(drop=True).assign(**metrics)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest VIX-triggered dollar-cost averaging rules')
+    parser.add_argument('--interval', type=int, default=CONTRIBUTION_INTERVAL, help='Rows between contributions')
+    parser.add_argument('--cooldowns', type=int, nargs='+', default=COOLDOWNS,
+                        help='Rows without purchases from each VIX local peak')
+    parser.add_argument('--max-waits', type=int, nargs='+', default=MAX_WAITS,
+                        help='Rows after which a tranche is bought anyway (0: never)')
+    parser.add_argument('--max-tranches', type=int, default=MAX_TRANCHES, help='Most tranches per rule')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--output', default=os.path.join(RESULT_DIR, 'backtest_results.csv'),
+                        help='Where to write the results table')
+    args = parser.parse_args(argv)
+
+    # All rows, including the recent years that have no long forward returns yet
+    data = identify_vix_peaks(load_data(lazy=True), window=PEAK_WINDOW)
+    rules = rule_grid(max_tranches=args.max_tranches, cooldowns=args.cooldowns, max_waits=args.max_waits)
+    print(f"Scoring {len(rules)} rules...")
+    start = time.perf_counter()
+    results = run_backtest(data, rules, args.interval, args.workers)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+    results['levels'] = results['levels'].map(lambda levels: '/'.join(f'{level:g}' for level in levels))
+    results = results.sort_values('cagr', ascending=False)
+    results.to_csv(args.output, index=False)
+    plain = results[(results['trigger'] == 'vix') & (results['levels'] == '0') & (results['cooldown'] == 0)]
+    print("\nBest rules:")
+    print(results.head(10).to_string(index=False))
+    if len(plain):
+        print("\nPlain dollar-cost averaging:")
+        print(plain.head(1).to_string(index=False))
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import contextlib
+import io
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from correlation import rolling_correlations
+from features import build_features, read_prices
+from returns_stats import PERIODS, PERIOD_NAMES, VIX_LABELS
+from vix_index import analyze_future_returns, calculate_recovery_time, identify_vix_peaks
+
+RESULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'result')
+# Forward horizon reported per volatility bucket in the summary
+SUMMARY_PERIOD = 250
+
+
+def read_manifest(path):
+    """Pairs to analyze from a CSV with columns name, vol_path and equity_path
+
+    Paths are resolved relative to the manifest file. Names identify the
+    pairs, so a name listed twice is an error.
+    """
+    manifest = pd.read_csv(path)
+    duplicated = manifest['name'][manifest['name'].duplicated()].unique()
+    if len(duplicated):
+        raise ValueError(f"duplicate pair names in {path}: {', '.join(map(str, duplicated))}")
+    base = os.path.dirname(os.path.abspath(path))
+    for column in ['vol_path', 'equity_path']:
+        manifest[column] = [os.path.join(base, value) for value in manifest[column]]
+    return manifest
+
+
+def share_prices(prices):
+    """Copy dates and both price columns into one shared memory block"""
+    n = len(prices)
+    shm = shared_memory.SharedMemory(create=True, size=max(3 * n * 8, 1))
+    try:
+        block = np.ndarray((3, n), dtype=np.float64, buffer=shm.buf)
+        # Dates as int64 nanoseconds, stored bit for bit in the float64 slots
+        block[0] = prices.index.to_numpy(dtype='datetime64[ns]').view(np.int64).view(np.float64)
+        block[1] = prices['VIX'].to_numpy()
+        block[2] = prices['SP500'].to_numpy()
+        del block
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, n
+
+
+def _attach_prices(shm_name, n):
+    """Rebuild the price frame of a pair from shared memory"""
+    # Workers share the parent's resource tracker, so attaching adds no extra cleanup duty
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray((3, n), dtype=np.float64, buffer=shm.buf)
+        dates = pd.DatetimeIndex(block[0].view(np.int64).astype('datetime64[ns]'), name='date')
+        prices = pd.DataFrame({'VIX': block[1], 'SP500': block[2]}, index=dates, copy=True)
+        del block
+    finally:
+        shm.close()
+    return prices
+
+
+def summarize_pair(prices, percentile_threshold=0.9, window=20):
+    """Headline numbers of the analysis for one pair, from the same functions as the single-pair report"""
+    period_name = PERIOD_NAMES[PERIODS.index(SUMMARY_PERIOD)]
+    # The analysis functions report their progress, which would interleave across workers
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = identify_vix_peaks(build_features(prices).dropna(), percentile_threshold, window)
+        recovery_df = calculate_recovery_time(data)
+        returns = analyze_future_returns(data, periods=[SUMMARY_PERIOD], period_names=[period_name])[period_name]
+    correlations = rolling_correlations(data)
+
+    summary = {
+        'start': data.index.min().strftime('%Y-%m-%d'),
+        'end': data.index.max().strftime('%Y-%m-%d'),
+        'rows': len(data),
+        'vol_max': data['VIX'].max(),
+        'correlation': data[['VIX', 'SP500']].corr().iloc[0, 1],
+        'avg_return_corr_250d': correlations['return_corr_250d'].mean(),
+        'avg_return_beta_250d': correlations['return_beta_250d'].mean(),
+        'peak_count': int(data['is_local_peak'].sum()),
+        'recovered_peaks': len(recovery_df),
+        'avg_drawdown': recovery_df['drawdown'].mean() if len(recovery_df) > 0 else np.nan,
+        'avg_recovery_days': recovery_df['recovery_days'].mean() if len(recovery_df) > 0 else np.nan
+    }
+    for label in VIX_LABELS:
+        summary[f'{period_name} return {label}'] = returns[label]['mean'] if label in returns else np.nan
+    return summary
+
+
+def _run_pair(name, shm_name, n):
+    """Worker entry point: never raises, errors are returned in the summary row"""
+    try:
+        return {'name': name, 'status': 'ok', **summarize_pair(_attach_prices(shm_name, n))}
+    except Exception as e:
+        return {'name': name, 'status': 'error', 'error': f'{type(e).__name__}: {e}',
+                'traceback': traceback.format_exc()}
+
+
+def run_batch(manifest, workers=None):
+    """Analyze every pair in the manifest and return one summary row per pair
+
+    Prices are parsed here and handed to the worker processes through shared
+    memory. A pair that fails gets an error row instead of stopping the batch.
+    """
+    rows = []
+    shared = {}
+    try:
+        for pair in manifest.itertuples(index=False):
+            if pair.name in shared:
+                # Never replace a block that is already shared, it would not be released
+                rows.append({'name': pair.name, 'status': 'error', 'error': 'duplicate pair name'})
+                continue
+            try:
+                shared[pair.name] = share_prices(read_prices(pair.vol_path, pair.equity_path))
+            except Exception as e:
+                rows.append({'name': pair.name, 'status': 'error', 'error': f'{type(e).__name__}: {e}'})
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_run_pair, name, shm.name, n): name
+                for name, (shm, n) in shared.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    # The worker process itself died
+                    rows.append({'name': futures[future], 'status': 'error', 'error': f'{type(e).__name__}: {e}'})
+    finally:
+        for shm, _ in shared.values():
+            shm.close()
+            shm.unlink()
+
+    order = {name: i for i, name in enumerate(manifest['name'])}
+    summary = pd.DataFrame(rows)
+    return summary.sort_values('name', key=lambda names: names.map(order)).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the VIX analysis over many index pairs')
+    parser.add_argument('manifest', help='CSV file with columns name, vol_path, equity_path')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--output', default=os.path.join(RESULT_DIR, 'batch_summary.csv'),
+                        help='Where to write the consolidated summary table')
+    args = parser.parse_args(argv)
+
+    manifest = read_manifest(args.manifest)
+    print(f"Analyzing {len(manifest)} pairs...")
+    summary = run_batch(manifest, args.workers)
+    summary.drop(columns=['traceback'], errors='ignore').to_csv(args.output, index=False)
+
+    for row in summary.itertuples(index=False):
+        if row.status != 'ok':
+            print(f"{row.name} failed: {row.error}")
+    print(f"Summary saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
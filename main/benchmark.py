@@ -0,0 +1,266 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import reference
+import vix_index
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT_DIR, 'benchmarks')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+# Synthetic CSV files are generated once per (rows, seed) and reused
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+# Rows of the dataset the original loop implementations are checked on
+CHECK_ROWS = 5_000
+# A function is flagged when it runs this many times slower than the baseline
+TOLERANCE = 1.5
+# ... and at least this many seconds slower, so timer noise on tiny inputs isn't flagged
+MIN_SLOWDOWN_S = 0.05
+# Seconds `import vix_index` may take in a fresh interpreter (best of a few)
+IMPORT_BUDGET_S = 0.75
+# Plotting modules only imported once a chart is drawn
+DEFERRED_MODULES = ['matplotlib', 'seaborn']
+# Daily bars only fit the datetime64[ns] range up to this many rows, minute bars are used beyond
+MAX_DAILY_ROWS = 100_000
+
+
+def synthetic_prices(n, seed=0):
+    """VIX/S&P 500-like OHLC bars with volatility clustering
+
+    Log volatility follows a mean-reverting AR(1) process with occasional
+    upward jumps (spikes), S&P 500 returns are scaled by it and negatively
+    correlated with its shocks (leverage effect), and VIX is the annualized
+    volatility in points plus a small premium noise. Returns (vix, sp500)
+    frames with the columns of the bundled CSV files.
+    """
+    rng = np.random.default_rng(seed)
+    if n <= MAX_DAILY_ROWS:
+        dates = pd.bdate_range('1800-01-01', periods=n, name='date')
+        bars_per_year = 252
+    else:
+        dates = pd.date_range('1990-01-02', periods=n, freq='min', name='date')
+        bars_per_year = 252 * 390
+
+    # AR(1) with coefficient 1 - alpha is an exponentially weighted mean of the shocks
+    alpha = 0.02
+    shocks = rng.standard_normal(n)
+    jumps = np.where(rng.random(n) < 0.002, rng.exponential(15.0, n), 0.0)
+    log_vol = pd.Series(shocks * 3.5 + jumps).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    sigma = 0.17 * np.exp(log_vol)
+
+    # Bar returns of the equity index, scaled by the previous bar's volatility
+    # and falling when volatility jumps
+    z = -0.7 * shocks + np.sqrt(1 - 0.7 ** 2) * rng.standard_normal(n)
+    bar_sigma = np.concatenate([[sigma[0]], sigma[:-1]]) / np.sqrt(bars_per_year)
+    log_returns = (0.07 / bars_per_year - bar_sigma ** 2 / 2) + bar_sigma * z
+    sp500 = 1000 * np.exp(np.cumsum(log_returns))
+    vix = 100 * sigma * np.exp(0.05 * rng.standard_normal(n))
+
+    def bars(close, spread, volume):
+        open_ = np.concatenate([[close[0]], close[:-1]]) * np.exp(spread * rng.standard_normal(n) / 4)
+        high = np.maximum(open_, close) * np.exp(spread * np.abs(rng.standard_normal(n)))
+        low = np.minimum(open_, close) * np.exp(-spread * np.abs(rng.standard_normal(n)))
+        return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close,
+                             'volume': volume, 'adjclose': close}, index=dates)
+
+    return (bars(vix, 0.03, np.zeros(n)),
+            bars(sp500, bar_sigma / 2, rng.integers(10 ** 8, 5 * 10 ** 9, n).astype(float)))
+
+
+def synthetic_files(n, seed=0, data_dir=DATA_DIR):
+    """Paths of the synthetic VIX and S&P 500 CSV files, written on first use"""
+    os.makedirs(data_dir, exist_ok=True)
+    paths = [os.path.join(data_dir, f'{name}_{n}_{seed}.csv') for name in ('vix', 'gspc')]
+    if not all(os.path.exists(path) for path in paths):
+        print(f"Generating {n:,} synthetic rows...")
+        for frame, path in zip(synthetic_prices(n, seed), paths):
+            # Write under a temporary name so an interrupted run leaves no partial file
+            frame.to_csv(path + '.tmp', float_format='%.6f')
+            os.replace(path + '.tmp', path)
+    return paths
+
+
+def _measure(function, *args, repeat=1):
+    """Best wall time over `repeat` calls, plus the peak traced allocation of one more call"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, min(times), (peak - before) / 2 ** 20
+
+
+def benchmark_size(n, seed=0, repeat=1):
+    """Time every analysis function on a synthetic dataset of n rows"""
+    vix_path, gspc_path = synthetic_files(n, seed)
+    steps = [
+        ('load_data', lambda: vix_index.load_data(vix_path, gspc_path, use_cache=False)),
+        ('identify_vix_peaks', lambda: vix_index.identify_vix_peaks(data)),
+        ('calculate_recovery_time', lambda: vix_index.calculate_recovery_time(data)),
+        ('analyze_future_returns', lambda: vix_index.analyze_future_returns(data))
+    ]
+    rows = []
+    data = None
+    for name, step in steps:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result, seconds, alloc_peak_mb = _measure(step, repeat=repeat)
+        if name == 'load_data':
+            data = result
+        rows.append({'rows': n, 'function': name, 'seconds': seconds, 'rows_per_s': n / seconds,
+                     'alloc_peak_mb': alloc_peak_mb})
+        print(f"{n:>12,} {name:<25} {seconds:9.3f}s {n / seconds:14,.0f} rows/s {alloc_peak_mb:9.1f} MB")
+    return rows
+
+
+def _same_returns(expected, actual):
+    if expected.keys() != actual.keys():
+        return False
+    for period in expected:
+        if expected[period].keys() != actual[period].keys():
+            return False
+        for category, stats in expected[period].items():
+            for name, value in stats.items():
+                if not np.isclose(actual[period][category][name], value, rtol=1e-12, atol=0, equal_nan=True):
+                    return False
+    return True
+
+
+def check_equivalence(n=CHECK_ROWS, seed=0):
+    """Compare the optimized functions with the original loops, returns {function: passed}"""
+    vix_path, gspc_path = synthetic_files(n, seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = reference.load_data(vix_path, gspc_path)
+        data = vix_index.load_data(vix_path, gspc_path, use_cache=False)
+        checks = {}
+        try:
+            pd.testing.assert_frame_equal(data, expected, check_freq=False)
+            checks['load_data'] = True
+        except AssertionError:
+            checks['load_data'] = False
+
+        # Feed both versions the same input from here on
+        expected = reference.identify_vix_peaks(data.copy())
+        data = vix_index.identify_vix_peaks(data.copy())
+        checks['identify_vix_peaks'] = data['is_local_peak'].equals(expected['is_local_peak']) and \
+            data['is_extreme_peak'].equals(expected['is_extreme_peak'])
+
+        expected_recovery = reference.calculate_recovery_time(expected)
+        recovery_df = vix_index.calculate_recovery_time(data)
+        checks['calculate_recovery_time'] = recovery_df.reset_index(drop=True).equals(
+            expected_recovery.reset_index(drop=True))
+
+        checks['analyze_future_returns'] = _same_returns(reference.analyze_future_returns(expected.copy()),
+                                                         vix_index.analyze_future_returns(data.copy()))
+    for name, passed in checks.items():
+        print(f"{name:<25} {'matches reference' if passed else 'DIFFERS FROM REFERENCE'}")
+    return checks
+
+
+def check_import(repeat=5, budget=IMPORT_BUDGET_S):
+    """Time `import vix_index` in fresh interpreters, returns {check: passed}
+
+    The import must stay within budget seconds and must not load the
+    plotting stack (DEFERRED_MODULES).
+    """
+    code = ("import sys, time; start = time.perf_counter(); import vix_index; "
+            "print(time.perf_counter() - start); "
+            f"print(','.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))")
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.splitlines()
+        times.append(float(output[0]))
+        loaded = output[1] if len(output) > 1 else ''
+    seconds = min(times)
+    print(f"import vix_index: {seconds:.3f}s (budget {budget:.2f}s), plotting modules loaded: {loaded or 'none'}")
+    return {'import_time': seconds <= budget, 'deferred_plotting_imports': not loaded}
+
+
+def read_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_baseline(rows, path=BASELINE_FILE):
+    """Merge the measured rows into the stored baseline"""
+    baseline = read_baseline(path)
+    for row in rows:
+        baseline.setdefault(str(row['rows']), {})[row['function']] = {
+            'seconds': row['seconds'], 'alloc_peak_mb': row['alloc_peak_mb']
+        }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare_baseline(rows, baseline, tolerance=TOLERANCE):
+    """Add the ratio to the baseline time to each row, returns the rows slower than tolerance"""
+    regressions = []
+    for row in rows:
+        stored = baseline.get(str(row['rows']), {}).get(row['function'])
+        row['baseline_seconds'] = stored['seconds'] if stored else np.nan
+        row['ratio'] = row['seconds'] / stored['seconds'] if stored else np.nan
+        if stored and row['ratio'] > tolerance and row['seconds'] - stored['seconds'] > MIN_SLOWDOWN_S:
+            regressions.append(row)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the VIX analysis functions on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='Dataset sizes in rows')
+    parser.add_argument('--repeat', type=int, default=1, help='Timed calls per function (best is kept)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+    parser.add_argument('--check-rows', type=int, default=CHECK_ROWS,
+                        help='Rows used to check results against the original implementations (0 to skip)')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Slowdown versus the baseline that counts as a regression')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_S,
+                        help='Seconds importing vix_index may take')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these timings as the new baseline')
+    parser.add_argument('--output', default=os.path.join(ROOT_DIR, 'result', 'benchmark.csv'),
+                        help='Where to write the timing table')
+    args = parser.parse_args(argv)
+
+    print("Checking import time...")
+    failed = [name for name, passed in check_import(budget=args.import_budget).items() if not passed]
+    if args.check_rows:
+        print(f"Checking results against the reference implementations on {args.check_rows:,} rows...")
+        failed += [name for name, passed in check_equivalence(args.check_rows, args.seed).items() if not passed]
+
+    print("Benchmarking...")
+    rows = [row for n in args.sizes for row in benchmark_size(n, args.seed, args.repeat)]
+    regressions = compare_baseline(rows, read_baseline(), args.tolerance)
+    pd.DataFrame(rows).to_csv(args.output, index=False)
+    print(f"Timings saved to {args.output}")
+
+    for row in regressions:
+        print(f"Regression: {row['function']} on {row['rows']:,} rows took {row['seconds']:.3f}s, "
+              f"{row['ratio']:.2f}x the baseline {row['baseline_seconds']:.3f}s")
+    if args.update_baseline:
+        write_baseline(rows)
+        print(f"Baseline updated: {BASELINE_FILE}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
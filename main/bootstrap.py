@@ -0,0 +1,141 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Statistics that get confidence intervals
+BOOTSTRAP_STATS = ['mean', 'median', 'positive_prob']
+# Resamples drawn per task; also fixes the RNG streams, so results don't depend on the worker count
+CHUNK_SIZE = 250
+
+# Per-process inputs shared by every chunk, set by _init_worker
+_state = {}
+
+
+def block_counts(rng, n_resamples, n, block_length):
+    """How many times each row is drawn by circular block bootstrap resamples
+
+    Each resample is ceil(n / block_length) blocks of consecutive rows
+    (wrapping around the end) starting at uniformly drawn rows, cut to n rows.
+    Returns an (n_resamples, n) float matrix of row multiplicities, built
+    from the block start indices with a difference array instead of
+    materializing the resampled row indices.
+    """
+    block_length = max(1, min(block_length, n))
+    n_blocks = -(-n // block_length)
+    starts = rng.integers(0, n, size=(n_resamples, n_blocks))
+    lengths = np.full(n_blocks, block_length)
+    lengths[-1] = n - (n_blocks - 1) * block_length
+
+    # +1 where a block starts and -1 after it ends; a block running past the
+    # last row continues with +1 at row 0 and ends at row end - n
+    ends = starts + lengths
+    wrapped = ends > n
+    offsets = np.arange(n_resamples)[:, None] * (n + 1)
+    edges = np.concatenate([(starts + offsets).ravel(), (np.where(wrapped, ends - n, ends) + offsets).ravel(),
+                            np.broadcast_to(offsets, starts.shape)[wrapped]])
+    weights = np.concatenate([np.ones(starts.size), -np.ones(starts.size), np.ones(wrapped.sum())])
+    steps = np.bincount(edges, weights, minlength=n_resamples * (n + 1)).reshape(n_resamples, n + 1)
+    return np.cumsum(steps[:, :n], axis=1)
+
+
+def _weighted_order_stat(cumulative, sorted_values, targets):
+    """Value at 0-based position `targets` of each resample's sorted multiset
+
+    cumulative is the running row multiplicity (resamples x rows) in
+    sorted_values order, overwritten here; targets is (resamples x k).
+    """
+    n_resamples, n = cumulative.shape
+    # Shift each resample's running total past the previous one so one searchsorted covers all
+    shift = (np.arange(n_resamples) * (n + 1.0))[:, None]
+    cumulative += shift
+    positions = np.searchsorted(cumulative.ravel(), (targets + shift).ravel(), side='right')
+    positions = positions.reshape(targets.shape) - np.arange(n_resamples)[:, None] * n
+    return sorted_values[np.minimum(positions, n - 1)]
+
+
+def _init_worker(codes, returns, n_buckets, block_lengths):
+    """Sort orders and bucket indicator columns of every horizon, once per process"""
+    # Rows outside the bins go to an extra last bucket that is never reported
+    codes = np.where(codes < 0, n_buckets, codes)
+    onehot = (codes[:, None] == np.arange(n_buckets)).astype(float)
+    horizons = []
+    for h in range(returns.shape[1]):
+        r = returns[:, h]
+        valid = ~np.isnan(r)
+        # Bucket-major, values ascending with NaN last inside each bucket
+        order = np.lexsort((r, codes))
+        design = np.hstack([onehot, onehot * valid[:, None], onehot * np.where(valid, r, 0)[:, None],
+                            onehot * (r > 0)[:, None]])
+        horizons.append((order, r[order], design))
+    _state.update(n_buckets=n_buckets, block_lengths=block_lengths, horizons=horizons, n=len(codes))
+
+
+def _bootstrap_chunk(seed, n_resamples):
+    """Bootstrap draws of every statistic for one chunk of resamples
+
+    Returns {stat: (n_resamples, n_buckets, n_horizons) array}, NaN where a
+    resample has no rows in a bucket.
+    """
+    rng = np.random.default_rng(seed)
+    n, n_buckets = _state['n'], _state['n_buckets']
+    draws = {name: np.empty((n_resamples, n_buckets, len(_state['horizons']))) for name in BOOTSTRAP_STATS}
+    for h, (order, sorted_values, design) in enumerate(_state['horizons']):
+        counts = block_counts(rng, n_resamples, n, _state['block_lengths'][h])
+        # Per resample and bucket: rows, non-NaN returns, return sum, positive returns
+        rows, valid, total, positive = np.split(counts @ design, 4, axis=1)
+
+        # Medians: middle order statistics inside each bucket's segment of the sorted rows
+        start = np.cumsum(rows, axis=1) - rows
+        cumulative = np.cumsum(counts[:, order], axis=1)
+        low, high = np.split(_weighted_order_stat(cumulative, sorted_values, np.hstack([
+            start + np.floor((valid - 1) / 2), start + np.floor(valid / 2)])), 2, axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            draws['mean'][:, :, h] = total / valid
+            draws['median'][:, :, h] = np.where(valid > 0, (low + high) / 2, np.nan)
+            draws['positive_prob'][:, :, h] = positive / rows
+    return draws
+
+
+def bootstrap_return_stats(codes, returns, n_buckets, n_resamples=10000, block_lengths=None, level=0.95,
+                           seed=0, workers=None):
+    """Block bootstrap confidence intervals of the grouped return statistics
+
+    codes and returns are as for grouped_return_stats. Resamples are circular
+    block bootstraps of the rows, with one block length per horizon (default:
+    the horizon's own length in rows, i.e. the span over which overlapping
+    forward returns are correlated), so buckets keep their serial dependence.
+    Chunks of resamples run in worker processes, each with its own child of
+    the seed. Returns {stat: (low, high)}, each an (n_buckets, n_horizons)
+    array of percentile interval bounds at the given confidence level; NaN
+    when there are no rows to resample.
+    """
+    codes = np.asarray(codes)
+    returns = np.asarray(returns, dtype=float)
+    if len(codes) == 0:
+        return {name: (np.full((n_buckets, returns.shape[1]), np.nan), np.full((n_buckets, returns.shape[1]), np.nan))
+                for name in BOOTSTRAP_STATS}
+    if block_lengths is None:
+        block_lengths = [1] * returns.shape[1]
+    initargs = (codes, returns, n_buckets, list(block_lengths))
+
+    sizes = [min(CHUNK_SIZE, n_resamples - start) for start in range(0, n_resamples, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers == 1:
+        _init_worker(*initargs)
+        chunks = [_bootstrap_chunk(chunk_seed, size) for chunk_seed, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, seeds, sizes))
+
+    tail = (1 - level) / 2 * 100
+    intervals = {}
+    with warnings.catch_warnings():
+        # Buckets that are empty in every resample have no interval
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for name in BOOTSTRAP_STATS:
+            values = np.concatenate([chunk[name] for chunk in chunks])
+            low, high = np.nanpercentile(values, [tail, 100 - tail], axis=0)
+            intervals[name] = (low, high)
+    return intervals
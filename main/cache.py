@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+# Total size of cached frames kept on disk; least recently used entries go first
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Bump when the stored layout or the feature code changes
+CACHE_VERSION = 1
+
+
+def cache_key(paths, params):
+    """Content hash of the source files plus the feature parameters"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'version': CACHE_VERSION, 'params': params}, sort_keys=True).encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_frame(key, cache_dir=CACHE_DIR):
+    """Load a cached frame with every column memory-mapped, None on a miss"""
+    entry = os.path.join(cache_dir, key)
+    meta_path = os.path.join(entry, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+
+    columns = {
+        column: np.load(os.path.join(entry, f'{i}.npy'), mmap_mode='r').view(np.ndarray)
+        for i, column in enumerate(meta['columns'])
+    }
+    index = pd.Index(np.load(os.path.join(entry, 'index.npy')), name=meta['index_name'])
+    # Mark the entry as recently used for LRU eviction
+    os.utime(entry)
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def write_frame(key, data, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Store a frame as one .npy file per column, then evict down to max_bytes"""
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = os.path.join(cache_dir, key)
+    # Write into a temporary directory and rename, so readers never see a partial entry
+    staging = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        for i, column in enumerate(data.columns):
+            np.save(os.path.join(staging, f'{i}.npy'), data[column].to_numpy())
+        np.save(os.path.join(staging, 'index.npy'), data.index.to_numpy())
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'columns': list(data.columns), 'index_name': data.index.name}, f)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    try:
+        os.rename(staging, entry)
+    except OSError:
+        # Another run already stored the same content
+        shutil.rmtree(staging, ignore_errors=True)
+    evict(cache_dir, max_bytes, keep=key)
+
+
+def _entry_size(entry):
+    return sum(entry_file.stat().st_size for entry_file in os.scandir(entry))
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, keep=None):
+    """Remove least recently used entries until the cache fits in max_bytes"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = [
+        (entry.stat().st_mtime, entry.path, _entry_size(entry.path))
+        for entry in os.scandir(cache_dir)
+        if entry.is_dir() and not entry.name.startswith('.')
+    ]
+    total = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.basename(path) == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def clear(cache_dir=CACHE_DIR):
+    """Remove every cached entry"""
+    shutil.rmtree(cache_dir, ignore_errors=True)
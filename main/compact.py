@@ -0,0 +1,209 @@
+import argparse
+import contextlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from features import CHANGE_PERIODS, PERCENTILE_WINDOWS, RETURN_PERIODS, read_prices, trailing_features
+from percentile_rank import expanding_percentile_rank
+
+RESULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'result')
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+RETURN_COLUMNS = {f'SP500_{period}d_return': period for period in RETURN_PERIODS}
+# Columns of the load_data frame, in its order
+COLUMNS = (['VIX', 'SP500'] + list(RETURN_COLUMNS) + [f'VIX_percentile_{name}' for name in PERCENTILE_WINDOWS]
+           + ['VIX_percentile_all', 'VIX_1y_max', 'VIX_is_1y_high'] + [f'VIX_{period}d_change' for period in CHANGE_PERIODS])
+# Largest difference from the float64 pipeline accepted by the tolerance report
+TOLERANCES = {
+    'features': 1e-6,        # relative, float32 derived features
+    'forward_returns': 0.0,  # computed from the float64 prices
+    'peak_flags': 0,         # rows flagged differently
+    'recovery': 0.0,
+    'return_stats': 1e-12
+}
+
+
+class CompactFrame:
+    """Memory-compact stand-in for the load_data frame
+
+    Supports what the analysis functions use: data[column], data[[columns]],
+    column assignment, `in`, len() and .index. Prices stay float64, derived
+    features are float32 and VIX_is_1y_high int8. Boolean columns (peak
+    flags) are bit-packed and categorical columns (VIX_category) are kept as
+    int8 codes. Forward return columns are not stored: each is computed from
+    the S&P 500 prices when requested, which needs the prices of the rows
+    after the frame's last row as well.
+    """
+
+    def __init__(self, index, columns, sp500, positions):
+        self.index = index
+        self._columns = columns
+        # S&P 500 prices (rows with a price only) and each row's position in them
+        self._sp500 = sp500
+        self._positions = positions
+        self._flags = {}
+        self._categories = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def columns(self):
+        stored = [column for column in COLUMNS if column in self._columns or column in RETURN_COLUMNS]
+        return pd.Index(stored + list(self._flags) + list(self._categories))
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, key):
+        if isinstance(key, list):
+            return pd.DataFrame({column: self[column] for column in key}, index=self.index)
+        if key == 'SP500':
+            values = self._sp500[self._positions]
+        elif key in RETURN_COLUMNS:
+            values = self._sp500[self._positions + RETURN_COLUMNS[key]] / self._sp500[self._positions] - 1
+        elif key in self._flags:
+            values = np.unpackbits(self._flags[key], count=len(self)).astype(bool)
+        elif key in self._categories:
+            codes, categories = self._categories[key]
+            values = pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+        else:
+            values = self._columns[key]
+        return pd.Series(values, index=self.index, name=key)
+
+    def __setitem__(self, column, value):
+        if isinstance(value, pd.Series):
+            value = value.array if isinstance(value.dtype, pd.CategoricalDtype) else value.to_numpy()
+        if isinstance(value, pd.Categorical):
+            self._categories[column] = (value.codes.astype(np.int8), value.categories)
+        elif np.asarray(value).dtype == bool:
+            self._flags[column] = np.packbits(value)
+        else:
+            value = np.asarray(value)
+            self._columns[column] = value.astype(np.float32) if value.dtype.kind == 'f' else value
+
+    def memory_usage(self):
+        """Bytes held by the frame"""
+        arrays = [self.index.to_numpy(), self._sp500, self._positions, *self._columns.values(), *self._flags.values(),
+                  *(codes for codes, _ in self._categories.values())]
+        return sum(array.nbytes for array in arrays)
+
+
+def compact_features(prices):
+    """CompactFrame with the rows and columns of build_features(prices).dropna()
+
+    The forward returns are never materialized: a row is complete when it has
+    an S&P 500 price and max(RETURN_PERIODS) more prices follow it.
+    """
+    vix = prices['VIX']
+    trailing = trailing_features(vix)
+    percentile_all = expanding_percentile_rank(vix)
+
+    has_price = prices['SP500'].notna().to_numpy()
+    sp500 = prices['SP500'].to_numpy()[has_price]
+    positions = np.cumsum(has_price) - 1
+    complete = (has_price & (positions + max(RETURN_PERIODS) < len(sp500)) & vix.notna().to_numpy()
+                & trailing.notna().all(axis=1).to_numpy() & percentile_all.notna().to_numpy())
+
+    # Keep the S&P 500 prices from the first complete row on
+    first = positions[complete][0] if complete.any() else 0
+    columns = {'VIX': vix.to_numpy()[complete], 'VIX_percentile_all': percentile_all.to_numpy(np.float32)[complete]}
+    for column in trailing.columns:
+        values = trailing[column].to_numpy()[complete]
+        columns[column] = values.astype(np.int8) if column == 'VIX_is_1y_high' else values.astype(np.float32)
+    return CompactFrame(prices.index[complete], columns, sp500[first:],
+                        (positions[complete] - first).astype(np.int32))
+
+
+def _run_pipeline(vix_index, data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = vix_index.identify_vix_peaks(data)
+        recovery_df = vix_index.calculate_recovery_time(data)
+        results = vix_index.analyze_future_returns(data)
+    return data, recovery_df, results
+
+
+def tolerance_report(vix_path, gspc_path):
+    """Run the analysis in float64 and in compact mode and compare the results
+
+    Returns (table, memory) where table has one row per compared quantity
+    with the largest difference, the tolerance and whether it passed, and
+    memory gives the resident bytes of both frames.
+    """
+    # Imported here: vix_index imports this module
+    import vix_index
+    prices = read_prices(vix_path, gspc_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = vix_index.load_data(vix_path, gspc_path, use_cache=False)
+    compact = compact_features(prices)
+    full, full_recovery, full_results = _run_pipeline(vix_index, full)
+    compact, compact_recovery, compact_results = _run_pipeline(vix_index, compact)
+    memory = {'float64': int(full.memory_usage(deep=True).sum()), 'compact': compact.memory_usage()}
+
+    rows = []
+    feature_diff = 0.0
+    for column in COLUMNS:
+        if column in RETURN_COLUMNS:
+            continue
+        expected = full[column].to_numpy(dtype=float)
+        feature_diff = max(feature_diff, np.max(np.abs(compact[column].to_numpy(dtype=float) - expected)
+                                                / np.maximum(np.abs(expected), 1), initial=0))
+    rows.append(('features', feature_diff, TOLERANCES['features']))
+    return_diff = max(np.max(np.abs(compact[column].to_numpy() - full[column].to_numpy()), initial=0)
+                      for column in RETURN_COLUMNS)
+    rows.append(('forward_returns', return_diff, TOLERANCES['forward_returns']))
+    rows.append(('peak_flags', int((compact['is_local_peak'] != full['is_local_peak']).sum()
+                                   + (compact['is_extreme_peak'] != full['is_extreme_peak']).sum()),
+                 TOLERANCES['peak_flags']))
+
+    if len(compact_recovery) == len(full_recovery) and len(full_recovery) > 0:
+        numeric = ['vix_value', 'drawdown', 'recovery_days']
+        same_dates = all((compact_recovery[column] == full_recovery[column]).all()
+                         for column in ['peak_date', 'lowest_point_date', 'recovery_date'])
+        recovery_diff = np.max(np.abs(compact_recovery[numeric].to_numpy(float) - full_recovery[numeric].to_numpy(float)))
+        rows.append(('recovery', recovery_diff if same_dates else np.inf, TOLERANCES['recovery']))
+    else:
+        rows.append(('recovery', 0.0 if len(compact_recovery) == len(full_recovery) else np.inf,
+                     TOLERANCES['recovery']))
+
+    stats_diff = 0.0
+    for period, categories in full_results.items():
+        for category, stats in categories.items():
+            for name, value in stats.items():
+                other = compact_results.get(period, {}).get(category, {}).get(name, np.nan)
+                stats_diff = max(stats_diff, abs(other - value) / max(abs(value), 1) if not np.isnan(other) else np.inf)
+    rows.append(('return_stats', stats_diff, TOLERANCES['return_stats']))
+
+    table = pd.DataFrame(rows, columns=['quantity', 'max_difference', 'tolerance'])
+    table['passed'] = table['max_difference'] <= table['tolerance']
+    return table, memory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare compact-mode results with the float64 analysis')
+    parser.add_argument('--vix', default=os.path.join(DATA_DIR, '^vix.csv'), help='VIX CSV file')
+    parser.add_argument('--gspc', default=os.path.join(DATA_DIR, '^GSPC.csv'), help='S&P 500 CSV file')
+    parser.add_argument('--output', default=os.path.join(RESULT_DIR, 'compact_report.md'),
+                        help='Where to write the tolerance report')
+    args = parser.parse_args(argv)
+
+    print("Comparing compact mode with float64...")
+    table, memory = tolerance_report(args.vix, args.gspc)
+    report = "# Compact Mode Tolerance Report\n\n"
+    report += f"* Frame memory: float64 {memory['float64'] / 2 ** 20:.1f} MB, compact {memory['compact'] / 2 ** 20:.1f} MB "
+    report += f"({memory['compact'] / memory['float64']:.0%})\n"
+    report += "* Features and return statistics: relative difference (to max(|value|, 1)); peak flags: rows that differ\n\n"
+    report += "| Quantity | Max Difference | Tolerance | Passed |\n"
+    report += "|----------|----------------|-----------|--------|\n"
+    for row in table.itertuples(index=False):
+        report += f"| {row.quantity} | {row.max_difference:.3g} | {row.tolerance:g} | {'yes' if row.passed else 'no'} |\n"
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report)
+    print(report)
+    print(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
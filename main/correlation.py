@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# Rolling window lengths in rows
+CORRELATION_WINDOWS = [20, 60, 120, 250, 500]
+# Price levels and daily returns
+BASES = ['level', 'return']
+# Rows per block of running sums, each block centered on its own mean
+BLOCK_SIZE = 4096
+
+
+def _block_sums(x, y, valid, block):
+    """Running sums of the moments in blocks of `block` rows, values centered on their block mean
+
+    Returns (running, x_centers, y_centers): running[:, b, j] is the sum of
+    count, x, y, x*x, y*y and x*y over the first j rows of block b.
+    """
+    n_blocks = -(-len(x) // block)
+    pad = [(0, n_blocks * block - len(x))] + [(0, 0)] * (x.ndim - 1)
+    shape = (n_blocks, block) + x.shape[1:]
+    valid = np.pad(valid, pad).reshape(shape)
+    x = np.where(valid, np.pad(x, pad).reshape(shape), 0.0)
+    y = np.where(valid, np.pad(y, pad).reshape(shape), 0.0)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        x_centers = np.where(count > 0, x.sum(axis=1) / count, 0.0)
+        y_centers = np.where(count > 0, y.sum(axis=1) / count, 0.0)
+    x = np.where(valid, x - x_centers[:, None], 0.0)
+    y = np.where(valid, y - y_centers[:, None], 0.0)
+    moments = np.stack([valid.astype(float), x, y, x * x, y * y, x * y])
+    running = np.concatenate([np.zeros((6, n_blocks, 1) + shape[2:]), np.cumsum(moments, axis=2)], axis=2)
+    return running, x_centers, y_centers
+
+
+def _recenter(sums, dx, dy):
+    """Moment sums around one center moved to a center lower by (dx, dy)"""
+    count, sx, sy, sxx, syy, sxy = sums
+    return np.stack([count, sx + count * dx, sy + count * dy, sxx + 2 * dx * sx + count * dx * dx,
+                     syy + 2 * dy * sy + count * dy * dy, sxy + dx * sy + dy * sx + count * dx * dy])
+
+
+def rolling_corr_beta(x, y, windows=CORRELATION_WINDOWS):
+    """Rolling correlation of x and y and beta of y on x for every window at once
+
+    x and y are arrays of shape (n,) or (n, pairs). Running sums of x, y,
+    x*x, y*y and x*y are taken once, so each window only costs a difference
+    of those sums per row. To keep the sums small, and the differences
+    precise on long histories, the running sums restart every BLOCK_SIZE
+    rows (at least the longest window) around that block's mean; a window
+    reaching into the next block adds that block's head to its own tail,
+    moved to the same center. A row gets a value when its window holds
+    `window` rows where both x and y are known, like pandas' rolling corr.
+    Returns (corr, beta), each of shape (n, [pairs,] len(windows)).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = len(x)
+    block = max([BLOCK_SIZE] + list(windows))
+    running, x_centers, y_centers = _block_sums(x, y, valid, block)
+    n_blocks = running.shape[1]
+    dx = (x_centers[:-1] - x_centers[1:])[:, None]
+    dy = (y_centers[:-1] - y_centers[1:])[:, None]
+
+    corr = np.full(x.shape + (len(windows),), np.nan)
+    beta = np.full(x.shape + (len(windows),), np.nan)
+    for k, window in enumerate(windows):
+        if window > n:
+            continue
+        # Window sums by first row (block, offset); windows from the first `inside` offsets end in the same block
+        inside = block - window + 1
+        sums = np.empty((6, n_blocks, block) + x.shape[1:])
+        sums[:, :, :inside] = running[:, :, window:] - running[:, :, :inside]
+        tail = running[:, :-1, -1:] - running[:, :-1, inside:block]
+        sums[:, :-1, inside:] = _recenter(tail, dx, dy) + running[:, 1:, 1:window]
+        count, sx, sy, sxx, syy, sxy = sums.reshape((6, n_blocks * block) + x.shape[1:])[:, :n - window + 1]
+
+        full = count == window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sxy - sx * sy / window
+            var_x = sxx - sx * sx / window
+            var_y = syy - sy * sy / window
+            corr[window - 1:, ..., k] = np.where(full, cov / np.sqrt(var_x * var_y), np.nan)
+            beta[window - 1:, ..., k] = np.where(full, cov / var_x, np.nan)
+    return corr, beta
+
+
+def rolling_correlations(data, windows=CORRELATION_WINDOWS):
+    """Rolling VIX/S&P 500 correlation and VIX beta on price levels and daily returns
+
+    Columns are '{basis}_corr_{window}d' and '{basis}_beta_{window}d' for
+    basis in BASES; beta is the VIX move per unit S&P 500 move (points per
+    point on levels, % per % on returns).
+    """
+    vix = data['VIX']
+    sp500 = data['SP500']
+    pairs = {
+        'level': (sp500.to_numpy(dtype=float), vix.to_numpy(dtype=float)),
+        'return': (sp500.pct_change().to_numpy(dtype=float), vix.pct_change().to_numpy(dtype=float))
+    }
+    columns = {}
+    for basis in BASES:
+        corr, beta = rolling_corr_beta(*pairs[basis], windows)
+        for k, window in enumerate(windows):
+            columns[f'{basis}_corr_{window}d'] = corr[:, k]
+            columns[f'{basis}_beta_{window}d'] = beta[:, k]
+    return pd.DataFrame(columns, index=data.index)
+
+
+def correlation_summary(correlations, windows=CORRELATION_WINDOWS):
+    """Latest, average, minimum and maximum of every rolling series, one row per basis and window"""
+    rows = []
+    for basis in BASES:
+        for window in windows:
+            corr = correlations[f'{basis}_corr_{window}d'].dropna()
+            beta = correlations[f'{basis}_beta_{window}d'].dropna()
+            if len(corr) == 0:
+                continue
+            rows.append({'basis': basis, 'window': window, 'latest_corr': corr.iloc[-1], 'mean_corr': corr.mean(),
+                         'min_corr': corr.min(), 'max_corr': corr.max(), 'latest_beta': beta.iloc[-1],
+                         'mean_beta': beta.mean()})
+    return pd.DataFrame(rows)
@@ -0,0 +1,241 @@
+import numpy as np
+import pandas as pd
+
+import profiling
+from percentile_rank import rolling_percentile_rank, expanding_percentile_rank
+
+# Derived feature parameters (part of the data cache key)
+RETURN_PERIODS = [20, 60, 120, 250, 500, 750, 1250]
+PERCENTILE_WINDOWS = {'1y': 250, '2y': 500}
+HIGH_WINDOW = 250
+CHANGE_PERIODS = [5, 10, 20]
+# Rows averaged by the range-based volatility estimators, and bars per year to annualize them
+RANGE_VOL_WINDOW = 20
+TRADING_DAYS = 252
+
+# Columns read_ohlc adds to the read_prices frame
+SP500_OHLC_COLUMNS = ['SP500_open', 'SP500_high', 'SP500_low', 'SP500_close']
+OHLC_COLUMNS = ['VIX_high'] + SP500_OHLC_COLUMNS
+
+# Rows of history needed to compute the trailing features of a new row
+TRAILING_LOOKBACK = max(max(PERCENTILE_WINDOWS.values()), HIGH_WINDOW, max(CHANGE_PERIODS) + 1)
+
+
+def feature_params():
+    """Feature parameters as a JSON-friendly dict"""
+    return {
+        'return_periods': RETURN_PERIODS,
+        'percentile_windows': PERCENTILE_WINDOWS,
+        'high_window': HIGH_WINDOW,
+        'change_periods': CHANGE_PERIODS
+    }
+
+
+def read_prices(vix_path, gspc_path):
+    """Read the adjusted closes of both CSV files into one frame"""
+    # Only the adjusted close is used, skip parsing the other columns
+    vix_data = pd.read_csv(vix_path, usecols=['date', 'adjclose'], index_col='date', parse_dates=True)
+    gspc_data = pd.read_csv(gspc_path, usecols=['date', 'adjclose'], index_col='date', parse_dates=True)
+
+    # Merge data
+    return pd.DataFrame({
+        'VIX': vix_data['adjclose'],
+        'SP500': gspc_data['adjclose']
+    })
+
+
+def read_ohlc(vix_path, gspc_path, dtype=np.float64):
+    """The read_prices frame plus the VIX high and the S&P 500 open/high/low/close
+
+    Only those columns are parsed, with an explicit dtype and the ISO 8601
+    date format pinned, so pandas skips type and format inference.
+    """
+    def read(path, columns):
+        return pd.read_csv(path, usecols=['date', *columns], dtype=dict.fromkeys(columns, dtype), index_col='date',
+                           parse_dates=['date'], date_format='ISO8601')
+
+    vix_data = read(vix_path, ['high', 'adjclose'])
+    gspc_data = read(gspc_path, ['open', 'high', 'low', 'close', 'adjclose'])
+    return pd.DataFrame({
+        'VIX': vix_data['adjclose'],
+        'SP500': gspc_data['adjclose'],
+        'VIX_high': vix_data['high'],
+        'SP500_open': gspc_data['open'],
+        'SP500_high': gspc_data['high'],
+        'SP500_low': gspc_data['low'],
+        'SP500_close': gspc_data['close']
+    })
+
+
+def range_volatility(open_, high, low, close, window=RANGE_VOL_WINDOW):
+    """Annualized Parkinson and Garman-Klass volatility of the trailing `window` bars, in % like VIX
+
+    Takes the four price Series of the bars. Each bar's variance estimate comes from its log high/low and close/open
+    ranges, and every window mean is a difference of one running sum. Rows
+    without a full bar (dates only in the VIX file) are skipped.
+    """
+    index = close.index
+    bars = pd.concat([open_, high, low, close], axis=1).dropna()
+    open_, high, low, close = bars.to_numpy(dtype=float).T
+    log_hl = np.log(high / low)
+    log_co = np.log(close / open_)
+    variances = {
+        'SP500_parkinson_vol': log_hl ** 2 / (4 * np.log(2)),
+        'SP500_garman_klass_vol': 0.5 * log_hl ** 2 - (2 * np.log(2) - 1) * log_co ** 2
+    }
+    result = pd.DataFrame(index=bars.index)
+    for name, variance in variances.items():
+        sums = np.concatenate([[0.0], np.cumsum(variance)])
+        mean = np.full(len(variance), np.nan)
+        mean[window - 1:] = (sums[window:] - sums[:-window]) / window
+        # Garman-Klass bars can be negative; a window averaging below zero has no volatility
+        result[name] = 100 * np.sqrt(TRADING_DAYS * np.maximum(mean, 0))
+    return result.reindex(index)
+
+
+def ohlc_features(prices):
+    """Columns of the OHLC mode: VIX high and its expanding percentile, S&P 500 low, range volatilities"""
+    features = prices[['VIX_high', 'SP500_low']].copy()
+    features['VIX_high_percentile_all'] = expanding_percentile_rank(prices['VIX_high'])
+    volatility = range_volatility(*(prices[column] for column in SP500_OHLC_COLUMNS))
+    for column in volatility.columns:
+        features[column] = volatility[column]
+    return features
+
+
+def forward_returns(sp500):
+    """S&P 500 return over each of the next RETURN_PERIODS rows (NaN until the future is known)"""
+    # Shift on the S&P series itself so gaps from the merge don't count as rows
+    prices = sp500.dropna()
+    returns = pd.DataFrame(index=sp500.index)
+    for period in RETURN_PERIODS:
+        returns[f'SP500_{period}d_return'] = prices.shift(-period) / prices - 1
+    return returns
+
+
+def trailing_features(vix):
+    """VIX features that only look back at most TRAILING_LOOKBACK rows"""
+    features = pd.DataFrame(index=vix.index)
+
+    # Calculate VIX relative levels
+    with profiling.stage('rolling percentile features'):
+        for name, window in PERCENTILE_WINDOWS.items():
+            features[f'VIX_percentile_{name}'] = rolling_percentile_rank(vix, window)
+
+    # Calculate VIX historical highs
+    features['VIX_1y_max'] = vix.rolling(HIGH_WINDOW).max()
+    features['VIX_is_1y_high'] = (vix == features['VIX_1y_max']).astype(int)
+
+    # Calculate VIX N-day change rates
+    for period in CHANGE_PERIODS:
+        features[f'VIX_{period}d_change'] = vix.pct_change(period)
+    return features
+
+
+def assemble(prices, returns, trailing, percentile_all):
+    """Combine the feature groups in the column order load_data has always used"""
+    data = pd.concat([prices[['VIX', 'SP500']], returns], axis=1)
+    for name in PERCENTILE_WINDOWS:
+        data[f'VIX_percentile_{name}'] = trailing[f'VIX_percentile_{name}']
+    data['VIX_percentile_all'] = percentile_all
+    for column in trailing.columns:
+        if column not in data:
+            data[column] = trailing[column]
+    return data
+
+
+def build_features(prices):
+    """Every derived column for the merged price frame, before dropping NaN rows"""
+    trailing = trailing_features(prices['VIX'])
+    with profiling.stage('expanding percentile feature'):
+        percentile_all = expanding_percentile_rank(prices['VIX'])
+    return assemble(prices, forward_returns(prices['SP500']), trailing, percentile_all)
+
+
+def warmup_start(vix):
+    """Position of the first row with TRAILING_LOOKBACK VIX values up to it, where the load_data frame starts"""
+    return int(np.searchsorted(np.cumsum(vix.notna().to_numpy()), TRAILING_LOOKBACK))
+
+
+def _forward_return(sp500, period):
+    prices = sp500.dropna()
+    return (prices.shift(-period) / prices - 1).reindex(sp500.index)
+
+
+def _is_high(vix, vix_max):
+    return (vix == vix_max).astype(int)
+
+
+# Derived columns: name -> (columns they are computed from, function of those columns)
+FEATURES = {}
+for _period in RETURN_PERIODS:
+    FEATURES[f'SP500_{_period}d_return'] = (['SP500'], lambda sp500, period=_period: _forward_return(sp500, period))
+for _name, _window in PERCENTILE_WINDOWS.items():
+    FEATURES[f'VIX_percentile_{_name}'] = (['VIX'], lambda vix, window=_window: rolling_percentile_rank(vix, window))
+FEATURES['VIX_percentile_all'] = (['VIX'], expanding_percentile_rank)
+FEATURES['VIX_1y_max'] = (['VIX'], lambda vix: vix.rolling(HIGH_WINDOW).max())
+FEATURES['VIX_is_1y_high'] = (['VIX', 'VIX_1y_max'], _is_high)
+FEATURES['VIX_high_percentile_all'] = (['VIX_high'], expanding_percentile_rank)
+for _name in ['SP500_parkinson_vol', 'SP500_garman_klass_vol']:
+    FEATURES[_name] = (SP500_OHLC_COLUMNS, lambda *bars, name=_name: range_volatility(*bars)[name])
+for _period in CHANGE_PERIODS:
+    FEATURES[f'VIX_{_period}d_change'] = (['VIX'], lambda vix, period=_period: vix.pct_change(period))
+
+
+class LazyFrame:
+    """Price frame whose derived columns are computed on first access
+
+    data[column] computes a FEATURES column (and what it depends on) the
+    first time it is asked for and keeps it. Only the rows before `start`
+    are left out (their features still see them, see warmup_start); the
+    recent rows without long forward returns stay, and each analysis drops
+    the rows missing the columns it uses (see complete_rows). Supports
+    data[column], data[[columns]], column assignment, `in`, len() and .index
+    like a DataFrame.
+    """
+
+    def __init__(self, prices, start=0):
+        self.index = prices.index[start:]
+        self._start = start
+        # Features are computed over every row, including the warm-up rows before start
+        self._full = {column: prices[column] for column in prices.columns}
+        self._columns = {column: prices[column].iloc[start:] for column in prices.columns}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def columns(self):
+        return pd.Index(list(self._columns) + [name for name in FEATURES if name not in self._columns and name in self])
+
+    @property
+    def computed(self):
+        """Columns held so far"""
+        return list(self._columns)
+
+    def __contains__(self, column):
+        # Registered columns count when the columns they are computed from are available
+        return column in self._columns or (column in FEATURES and all(dependency in self
+                                                                       for dependency in FEATURES[column][0]))
+
+    def __getitem__(self, key):
+        if isinstance(key, list):
+            return pd.DataFrame({column: self[column] for column in key}, index=self.index)
+        if key not in self._columns:
+            self._columns[key] = self._full_column(key).iloc[self._start:]
+        return self._columns[key]
+
+    def _full_column(self, column):
+        if column not in self._full:
+            dependencies, function = FEATURES[column]
+            self._full[column] = function(*(self._full_column(dependency) for dependency in dependencies)).rename(column)
+        return self._full[column]
+
+    def __setitem__(self, column, value):
+        self._columns[column] = pd.Series(value, index=self.index, name=column)
+
+
+def complete_rows(data, columns):
+    """Boolean mask of the rows that have a value in every one of columns"""
+    return np.logical_and.reduce([data[column].notna().to_numpy() for column in columns] +
+                                 [np.ones(len(data), dtype=bool)])
@@ -0,0 +1,234 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+from features import (RETURN_PERIODS, TRAILING_LOOKBACK, assemble, build_features, feature_params,
+                      forward_returns, read_prices, trailing_features)
+from peaks import peak_flags
+from percentile_rank import extend_expanding_percentile_rank
+from recovery import recovery_table
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+TROUGH_LOOKAHEAD = 250
+RECOVERY_HORIZON = 750
+FORWARD_COLUMNS = [f'SP500_{period}d_return' for period in RETURN_PERIODS]
+
+
+def _prefix_hash(path, size):
+    """SHA-256 of the first `size` bytes of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _file_state(path, offset):
+    return {'offset': offset, 'prefix_hash': _prefix_hash(path, offset)}
+
+
+def _appended_lines(path, offset):
+    """Header line and the complete lines appended after `offset`"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(offset)
+        appended = f.read()
+    # Ignore a trailing line that is still being written
+    appended = appended[:appended.rfind(b'\n') + 1]
+    return header, appended.splitlines(keepends=True)
+
+
+def _read_lines(header, lines):
+    return pd.read_csv(io.BytesIO(header + b''.join(lines)), index_col='date', parse_dates=True)['adjclose']
+
+
+def _read_appended(vix_path, gspc_path, files):
+    """New rows present in both files, plus the file offsets after consuming them
+
+    Rows are only ingested once both series have them, so a file that runs
+    ahead keeps its extra rows for the next update.
+    """
+    vix_header, vix_lines = _appended_lines(vix_path, files['vix']['offset'])
+    gspc_header, gspc_lines = _appended_lines(gspc_path, files['gspc']['offset'])
+    # ISO dates in the first field compare correctly as bytes
+    last_date = min(
+        vix_lines[-1].split(b',', 1)[0] if vix_lines else b'',
+        gspc_lines[-1].split(b',', 1)[0] if gspc_lines else b''
+    )
+    vix_lines = [line for line in vix_lines if line.split(b',', 1)[0] <= last_date]
+    gspc_lines = [line for line in gspc_lines if line.split(b',', 1)[0] <= last_date]
+
+    offsets = {
+        'vix': files['vix']['offset'] + sum(len(line) for line in vix_lines),
+        'gspc': files['gspc']['offset'] + sum(len(line) for line in gspc_lines)
+    }
+    if not vix_lines:
+        return None, offsets
+    prices = pd.DataFrame({
+        'VIX': _read_lines(vix_header, vix_lines),
+        'SP500': _read_lines(gspc_header, gspc_lines)
+    })
+    return prices, offsets
+
+
+def _consumed_offset(path):
+    """Size of the file up to its last complete line"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    return content.rfind(b'\n') + 1
+
+
+def _complete_rows(raw):
+    """Rows that have every feature, i.e. the rows load_data keeps"""
+    return raw.drop(columns=['is_local_peak', 'is_extreme_peak'], errors='ignore').notna().all(axis=1).to_numpy()
+
+
+def _extend_raw(raw, new_prices):
+    """Append new price rows to the raw feature frame, updating only what they affect"""
+    n_old = len(raw)
+    prices = pd.concat([raw[['VIX', 'SP500']], new_prices])
+
+    # Forward returns of the rows from the max(RETURN_PERIODS)-th last S&P 500 price on were
+    # pending on these prices; returns count S&P 500 prices, not merged rows
+    priced = np.flatnonzero(raw['SP500'].notna().to_numpy())
+    start = int(priced[-max(RETURN_PERIODS)]) if len(priced) >= max(RETURN_PERIODS) else 0
+    returns = forward_returns(prices['SP500'].iloc[start:])
+
+    # Trailing features and expanding percentile of the new rows only
+    trailing_start = max(0, n_old - TRAILING_LOOKBACK)
+    trailing = trailing_features(prices['VIX'].iloc[trailing_start:]).iloc[n_old - trailing_start:]
+    percentile_all = extend_expanding_percentile_rank(raw['VIX'], new_prices['VIX'])
+
+    new_rows = assemble(new_prices, returns.iloc[n_old - start:], trailing, percentile_all)
+    new_rows['is_local_peak'] = False
+    new_rows['is_extreme_peak'] = new_rows['VIX_percentile_all'] > 0.95
+
+    raw = raw.copy()
+    raw.iloc[start:, [raw.columns.get_loc(column) for column in FORWARD_COLUMNS]] = \
+        returns.iloc[:n_old - start].to_numpy()
+    return pd.concat([raw, new_rows])
+
+
+def _full_rebuild(vix_path, gspc_path, percentile_threshold, window):
+    raw = build_features(read_prices(vix_path, gspc_path))
+    raw['is_local_peak'] = False
+    complete = _complete_rows(raw)
+    data = raw[complete]
+    raw.loc[complete, 'is_local_peak'] = peak_flags(data, percentile_threshold, window)
+    raw['is_extreme_peak'] = raw['VIX_percentile_all'] > 0.95
+    data = raw[complete]
+    recovery_df = recovery_table(data, np.flatnonzero(data['is_local_peak'].to_numpy()),
+                                 TROUGH_LOOKAHEAD, RECOVERY_HORIZON)
+    return raw, recovery_df
+
+
+def _update_peaks(raw, complete_before, percentile_threshold, window):
+    """Recompute peak flags for the complete rows whose neighbourhood changed"""
+    positions = np.flatnonzero(_complete_rows(raw))
+    # Flags of the last `window` old complete rows depended on rows that were missing;
+    # another `window` rows before them give those rows their full left window
+    first_changed = max(0, complete_before - window)
+    first_needed = max(0, complete_before - 2 * window)
+    flags = peak_flags(raw.iloc[positions[first_needed:]], percentile_threshold, window)
+    raw.iloc[positions[first_changed:], raw.columns.get_loc('is_local_peak')] = flags[first_changed - first_needed:]
+
+
+def _update_recovery(data, recovery_df, complete_before):
+    """Recompute recoveries for peaks whose trough or recovery window reached past the old data"""
+    cutoff = max(0, complete_before - TROUGH_LOOKAHEAD - RECOVERY_HORIZON)
+    peaks = np.flatnonzero(data['is_local_peak'].to_numpy()[cutoff:])
+    tail = recovery_table(data.iloc[cutoff:], peaks, TROUGH_LOOKAHEAD, RECOVERY_HORIZON)
+    if cutoff == 0 or len(recovery_df) == 0:
+        return tail
+    kept = recovery_df[recovery_df['peak_date'] < data.index[cutoff]]
+    if len(tail) == 0:
+        return kept.reset_index(drop=True)
+    return pd.concat([kept, tail], ignore_index=True)
+
+
+def _read_state(state_dir):
+    meta_path = os.path.join(state_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    raw = cache.read_frame('raw', cache_dir=state_dir)
+    recovery_df = cache.read_frame('recovery', cache_dir=state_dir)
+    if raw is None or recovery_df is None:
+        return None
+    return meta, raw.copy(), recovery_df.reset_index(drop=True)
+
+
+def _write_state(state_dir, meta, raw, recovery_df):
+    for key, frame in (('raw', raw), ('recovery', recovery_df)):
+        cache.clear(os.path.join(state_dir, key))
+        cache.write_frame(key, frame, cache_dir=state_dir, max_bytes=float('inf'))
+    with open(os.path.join(state_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+
+def update(vix_path, gspc_path, state_dir=STATE_DIR, percentile_threshold=0.9, window=20):
+    """Bring the saved analysis state up to date with the rows appended to the CSV files
+
+    Returns (data, recovery_df, info): data is what load_data followed by
+    identify_vix_peaks would give and recovery_df what calculate_recovery_time
+    would give on the current files. Rows whose forward returns still lack
+    future prices stay in the saved state as NaN (pending) and join the
+    analysis once enough data has arrived. The state is rebuilt from scratch
+    when the parameters change or the already-ingested part of a file was
+    modified.
+    """
+    params = {'features': feature_params(), 'percentile_threshold': percentile_threshold, 'window': window,
+              'trough_lookahead': TROUGH_LOOKAHEAD, 'recovery_horizon': RECOVERY_HORIZON}
+    paths = {'vix': vix_path, 'gspc': gspc_path}
+    state = _read_state(state_dir)
+    valid = (
+        state is not None
+        and state[0]['params'] == params
+        and all(os.path.getsize(paths[name]) >= file['offset']
+                and _prefix_hash(paths[name], file['offset']) == file['prefix_hash']
+                for name, file in state[0]['files'].items())
+    )
+
+    new_prices = None
+    if valid:
+        meta, raw, recovery_df = state
+        new_prices, offsets = _read_appended(vix_path, gspc_path, meta['files'])
+        if new_prices is not None and new_prices.index.min() <= raw.index.max():
+            valid = False
+
+    if not valid:
+        raw, recovery_df = _full_rebuild(vix_path, gspc_path, percentile_threshold, window)
+        offsets = {name: _consumed_offset(path) for name, path in paths.items()}
+        complete_before = 0
+        info = {'full_rebuild': True, 'new_rows': len(raw), 'recovery_changed': True}
+    elif new_prices is None:
+        complete_before = int(_complete_rows(raw).sum())
+        info = {'full_rebuild': False, 'new_rows': 0, 'recovery_changed': False}
+    else:
+        complete_before = int(_complete_rows(raw).sum())
+        raw = _extend_raw(raw, new_prices)
+        _update_peaks(raw, complete_before, percentile_threshold, window)
+        updated = _update_recovery(raw[_complete_rows(raw)], recovery_df, complete_before)
+        info = {'full_rebuild': False, 'new_rows': len(new_prices),
+                'recovery_changed': not updated.equals(recovery_df)}
+        recovery_df = updated
+
+    data = raw[_complete_rows(raw)]
+    info['complete_rows_added'] = len(data) - complete_before
+    # Rows still waiting for future prices to fill their forward returns
+    info['pending_rows'] = int(raw[FORWARD_COLUMNS].isna().any(axis=1).sum())
+    if info['new_rows'] > 0:
+        meta = {'params': params, 'files': {name: _file_state(paths[name], offsets[name]) for name in paths}}
+        _write_state(state_dir, meta, raw, recovery_df)
+    return data, recovery_df, info
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+
+def local_peak_mask(values, window):
+    """Flag values strictly above the max of the `window` values on each side
+
+    The first and last `window` rows never qualify, as in the original loop.
+    """
+    values = pd.Series(np.asarray(values, dtype=float))
+    # Max of the previous window (excluding today) and of the next window
+    left_max = values.rolling(window).max().shift(1).to_numpy()
+    right_max = values[::-1].rolling(window).max()[::-1].shift(-1).to_numpy()
+    return (values.to_numpy() > left_max) & (values.to_numpy() > right_max)
+
+
+def peak_flags(data, percentile_threshold=0.9, window=20, value_column='VIX', percentile_column='VIX_percentile_all'):
+    """Local VIX peaks above the historical percentile threshold
+
+    value_column/percentile_column pick the series, e.g. the VIX daily high
+    and its percentile in OHLC mode.
+    """
+    return (local_peak_mask(data[value_column], window)
+            & (data[percentile_column] > percentile_threshold).to_numpy())
+
+
+def peak_matrix(data, percentile_thresholds, windows):
+    """Local peak flags for every (percentile_threshold, window) combination
+
+    Returns a boolean DataFrame indexed like `data` with one column per
+    (percentile_threshold, window) pair; `data` is not modified.
+    """
+    vix = data['VIX'].to_numpy()
+    percentile = data['VIX_percentile_all'].to_numpy()
+    # Each window's local-max mask is shared by every threshold
+    local_max = {window: local_peak_mask(vix, window) for window in windows}
+
+    flags = {}
+    for threshold in percentile_thresholds:
+        above = percentile > threshold
+        for window in windows:
+            flags[(threshold, window)] = local_max[window] & above
+
+    columns = pd.MultiIndex.from_tuples(flags.keys(), names=['percentile_threshold', 'window'])
+    return pd.DataFrame(np.column_stack(list(flags.values())) if flags else np.empty((len(data), 0), dtype=bool),
+                        index=data.index, columns=columns)
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+# Rows handled per block when ranking against the whole history
+EXPANDING_BLOCK_SIZE = 1 << 16
+
+
+def _value_codes(values):
+    """Map values to dense integer codes, NaN gets the code after every real value"""
+    valid = ~np.isnan(values)
+    codes = np.empty(len(values), dtype=np.int64)
+    uniques, inverse = np.unique(values[valid], return_inverse=True)
+    codes[valid] = inverse
+    codes[~valid] = len(uniques)
+    return codes, valid, len(uniques) + 1
+
+
+def _block_search(sorted_codes, first, level, query, before):
+    """Branch-free binary search inside sorted blocks of 2**level codes starting at first"""
+    idx = first.copy()
+    for step in range(level - 1, -1, -1):
+        half = 1 << step
+        idx += before(sorted_codes[idx + half - 1], query) * half
+    return idx + before(sorted_codes[idx], query)
+
+
+def _range_counts(codes, n_codes, start, end):
+    """Count elements in codes[start:end] that are < and <= the code at end - 1
+
+    Uses a merge sort tree built one level at a time: at level k the codes are
+    sorted inside aligned blocks of 2**k rows, and every range decomposes into
+    at most two such blocks per level. The total cost is O(n log w) with O(n)
+    memory, where w is the longest range.
+    """
+    n = len(codes)
+    query = codes[end - 1]
+    lo = start.copy()
+    hi = end.copy()
+    less = np.zeros(len(lo), dtype=np.int64)
+    less_equal = np.zeros(len(lo), dtype=np.int64)
+
+    # Level 0: every row is its own block, so the codes are already sorted
+    block = np.arange(n, dtype=np.int64)
+    code = codes
+    level = 0
+    while (lo < hi).any():
+        if level > 0:
+            # Merge the sorted halves of each block from the previous level
+            keys = (block >> 1) * n_codes + code
+            keys.sort(kind='stable')
+            block, code = np.divmod(keys, n_codes)
+        size = 1 << level
+
+        # Peel an aligned block off the left and right edge of each range
+        for from_left in (True, False):
+            edge = lo if from_left else hi
+            take = ((edge >> level) & 1 == 1) & (hi - lo >= size)
+            if not take.any():
+                continue
+            first = edge[take] if from_left else edge[take] - size
+            less[take] += _block_search(code, first, level, query[take], np.less) - first
+            less_equal[take] += _block_search(code, first, level, query[take], np.less_equal) - first
+            edge[take] += size if from_left else -size
+        level += 1
+
+    return less, less_equal
+
+
+def _expanding_counts(codes, n_codes, first=0):
+    """Count rows up to and including each row whose code is < and <= its code
+
+    Rows are processed in blocks: counts against all previous blocks come from
+    a running histogram over the codes, counts inside the block from the merge
+    sort tree, so the cost is O(n log n) plus one histogram pass per block.
+    Rows before `first` only enter the histogram and get no counts of their own.
+    """
+    n = len(codes)
+    less = np.empty(n - first, dtype=np.int64)
+    less_equal = np.empty(n - first, dtype=np.int64)
+    # history[c] = number of rows in previous blocks with code < c
+    history = np.zeros(n_codes + 1, dtype=np.int64)
+    history[1:] = np.cumsum(np.bincount(codes[:first], minlength=n_codes))
+
+    for block_start in range(first, n, EXPANDING_BLOCK_SIZE):
+        block = codes[block_start:block_start + EXPANDING_BLOCK_SIZE]
+        rows = slice(block_start - first, block_start - first + len(block))
+        end = np.arange(1, len(block) + 1, dtype=np.int64)
+        block_less, block_less_equal = _range_counts(block, n_codes, np.zeros_like(end), end)
+
+        less[rows] = history[block] + block_less
+        less_equal[rows] = history[block + 1] + block_less_equal
+        history[1:] += np.cumsum(np.bincount(block, minlength=n_codes))
+
+    return less, less_equal
+
+
+def _window_percentile(values, window=None):
+    """Percentile rank of each value within its trailing window (None = expanding)"""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    codes, valid, n_codes = _value_codes(values)
+    end = np.arange(1, n + 1, dtype=np.int64)
+    if window is None:
+        start = np.zeros(n, dtype=np.int64)
+        less, less_equal = _expanding_counts(codes, n_codes)
+    else:
+        start = np.maximum(end - window, 0)
+        less, less_equal = _range_counts(codes, n_codes, start, end)
+
+    valid_count = np.concatenate([[0], np.cumsum(valid)])
+    count = valid_count[end] - valid_count[start]
+
+    result = _average_rank_pct(less, less_equal, count, valid)
+    if window is not None:
+        # Match rolling(window) with min_periods=window
+        result[count < window] = np.nan
+    return result
+
+
+def _average_rank_pct(less, less_equal, count, valid):
+    """Average rank of tied values over the window size, as in pandas rank(method='average', pct=True)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = ((less + less_equal + 1) / 2) / count
+    result[~valid] = np.nan
+    return result
+
+
+def rolling_percentile_rank(series, window):
+    """Percentile rank of each value within the trailing window
+
+    Same result as series.rolling(window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    """
+    return pd.Series(_window_percentile(series.to_numpy(), window), index=series.index, name=series.name)
+
+
+def expanding_percentile_rank(series):
+    """Percentile rank of each value within all values up to it
+
+    Same result as series.expanding().apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    """
+    return pd.Series(_window_percentile(series.to_numpy()), index=series.index, name=series.name)
+
+
+def extend_expanding_percentile_rank(history, series):
+    """Expanding percentile rank of new values that follow the values in history
+
+    Same result as the tail of expanding_percentile_rank(pd.concat([history, series])),
+    without computing ranks for the history rows.
+    """
+    first = len(history)
+    values = np.concatenate([np.asarray(history, dtype=float), series.to_numpy(dtype=float)])
+    codes, valid, n_codes = _value_codes(values)
+    less, less_equal = _expanding_counts(codes, n_codes, first)
+    count = np.cumsum(valid)[first:]
+    result = _average_rank_pct(less, less_equal, count, valid[first:])
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+class ExpandingPercentileRank:
+    """Expanding percentile rank of a series fed one chunk at a time
+
+    Earlier chunks are kept as a histogram (sorted distinct values and their
+    counts), so the state grows with the number of distinct values rather
+    than the number of rows. Each chunk's ranks equal the matching rows of
+    expanding_percentile_rank over the whole series.
+    """
+
+    def __init__(self):
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.n_valid = 0
+
+    def update(self, values):
+        """Percentile ranks of the next chunk of values"""
+        values = np.asarray(values, dtype=float)
+        codes, valid, n_codes = _value_codes(values)
+        chunk_less, chunk_less_equal = _expanding_counts(codes, n_codes)
+
+        # Rows of earlier chunks below and at most each value
+        below = np.concatenate([[0], np.cumsum(self.counts)])
+        less = below[np.searchsorted(self.values, values, side='left')] + chunk_less
+        less_equal = below[np.searchsorted(self.values, values, side='right')] + chunk_less_equal
+        count = self.n_valid + np.cumsum(valid)
+        result = _average_rank_pct(less, less_equal, count, valid)
+
+        # Merge the chunk into the histogram
+        uniques, unique_counts = np.unique(values[valid], return_counts=True)
+        merged = np.union1d(self.values, uniques)
+        counts = np.zeros(len(merged), dtype=np.int64)
+        counts[np.searchsorted(merged, self.values)] += self.counts
+        counts[np.searchsorted(merged, uniques)] += unique_counts
+        self.values, self.counts = merged, counts
+        self.n_valid += int(valid.sum())
+        return result
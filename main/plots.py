@@ -0,0 +1,348 @@
+import os
+import warnings
+warnings.filterwarnings('ignore')
+
+import numpy as np
+
+# matplotlib and seaborn are imported, and the chart style applied, by
+# setup_style() on the first chart, so importing the analysis modules stays cheap
+plt = None
+PercentFormatter = None
+
+# Preferred font when installed (Traditional Chinese labels)
+CJK_FONT = 'Microsoft JhengHei'
+
+# Rolling correlations drawn under the relationship chart: column -> legend label
+CHART_CORRELATIONS = {
+    'return_corr_60d': '60-day, daily returns',
+    'return_corr_250d': '250-day, daily returns',
+    'level_corr_250d': '250-day, price levels'
+}
+
+# Define color scheme
+COLORS = {
+    'primary': '#2E86C1',  # Blue
+    'secondary': '#E74C3C',  # Red
+    'accent': '#F39C12',  # Orange
+    'neutral': '#95A5A6',  # Gray
+    'success': '#27AE60',  # Green
+    'background': '#F8F9FA',  # Light gray background
+    'grid': '#E0E0E0'  # Grid line color
+}
+
+
+def setup_style():
+    """Import matplotlib/seaborn and apply the chart style, once per process"""
+    global plt, PercentFormatter
+    if plt is not None:
+        return plt
+    import matplotlib.pyplot as pyplot
+    import seaborn as sns
+    from matplotlib import font_manager
+    from matplotlib.ticker import PercentFormatter as formatter
+
+    # Set Chinese font, only when it is installed (a missing font makes
+    # matplotlib search its font list again on every text element)
+    if any(font.name == CJK_FONT for font in font_manager.fontManager.ttflist):
+        pyplot.rcParams['font.sans-serif'] = [CJK_FONT]
+    pyplot.rcParams['axes.unicode_minus'] = False
+
+    # Set chart style
+    pyplot.style.use('seaborn-v0_8')
+    sns.set_style("whitegrid", {'grid.linestyle': '--', 'grid.alpha': 0.3})
+
+    # Set chart size and font
+    pyplot.rcParams['figure.figsize'] = (16, 10)
+    pyplot.rcParams['figure.dpi'] = 300
+    pyplot.rcParams['font.family'] = 'sans-serif'
+    pyplot.rcParams['font.size'] = 12
+    pyplot.rcParams['axes.titlesize'] = 16
+    pyplot.rcParams['axes.labelsize'] = 14
+    pyplot.rcParams['xtick.labelsize'] = 12
+    pyplot.rcParams['ytick.labelsize'] = 12
+
+    plt, PercentFormatter = pyplot, formatter
+    return plt
+
+
+def plot_vix_sp500_relationship(data, correlations=None, dpi=300):
+    """Plot VIX and SP500 relationship
+
+    With `correlations` (from correlation.rolling_correlations) a panel of
+    rolling correlations is added at the bottom.
+    """
+    setup_style()
+    print("Plotting VIX and SP500 relationship...")
+    
+    if correlations is None:
+        fig, axes = plt.subplots(2, 1, figsize=(16, 12), gridspec_kw={'height_ratios': [2, 1]})
+    else:
+        fig, axes = plt.subplots(3, 1, figsize=(16, 16), gridspec_kw={'height_ratios': [2, 1, 1]})
+    fig.patch.set_facecolor(COLORS['background'])
+    
+    # Upper plot: SP500 and VIX time series
+    ax1 = axes[0]
+    ax1.set_facecolor(COLORS['background'])
+    ax1.plot(data.index, data['SP500'], color=COLORS['primary'], label='S&P 500 Index', linewidth=2)
+    ax1.set_ylabel('S&P 500 Index', color=COLORS['primary'], fontsize=14, fontweight='bold')
+    ax1.tick_params(axis='y', labelcolor=COLORS['primary'])
+    
+    # Mark VIX peaks
+    peak_dates = data[data['is_local_peak']].index
+    for date in peak_dates:
+        ax1.axvline(x=date, color=COLORS['secondary'], linestyle='--', alpha=0.3)
+    
+    ax2 = ax1.twinx()
+    ax2.plot(data.index, data['VIX'], color=COLORS['secondary'], label='VIX Fear Index', linewidth=2)
+    ax2.fill_between(data.index, data['VIX'], color=COLORS['secondary'], alpha=0.1)
+    ax2.set_ylabel('VIX Fear Index', color=COLORS['secondary'], fontsize=14, fontweight='bold')
+    ax2.tick_params(axis='y', labelcolor=COLORS['secondary'])
+    
+    # Add legend
+    lines1, labels1 = ax1.get_legend_handles_labels()
+    lines2, labels2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left', frameon=True, facecolor='white')
+    
+    # Lower plot: Scatter plot of future 1-year returns when VIX > 30
+    ax3 = axes[1]
+    ax3.set_facecolor(COLORS['background'])
+    high_vix = data[data['VIX'] > 30].copy()
+    scatter = ax3.scatter(high_vix.index, high_vix['SP500_250d_return'], 
+                        c=high_vix['VIX'], cmap='YlOrRd', 
+                        s=high_vix['VIX']*2, alpha=0.7)
+    
+    ax3.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
+    ax3.set_ylabel('Future 1-Year Return', fontsize=14, fontweight='bold')
+    ax3.yaxis.set_major_formatter(PercentFormatter(1.0))
+    
+    # Add colorbar with custom styling
+    cbar = plt.colorbar(scatter, ax=ax3, label='VIX Value')
+    cbar.ax.set_ylabel('VIX Value', fontsize=12, fontweight='bold')
+    
+    # Bottom plot: rolling VIX/S&P 500 correlations
+    if correlations is not None:
+        ax4 = axes[2]
+        ax4.set_facecolor(COLORS['background'])
+        colors = [COLORS['primary'], COLORS['secondary'], COLORS['neutral']]
+        for (column, label), color in zip(CHART_CORRELATIONS.items(), colors):
+            ax4.plot(correlations.index, correlations[column], color=color, label=label, linewidth=1.5,
+                     linestyle='--' if column.startswith('level') else '-')
+        ax4.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
+        ax4.set_ylim(-1, 1)
+        ax4.set_ylabel('Rolling Correlation', fontsize=14, fontweight='bold')
+        ax4.legend(loc='lower left', frameon=True, facecolor='white')
+    
+    plt.suptitle('VIX Fear Index and S&P 500 Index Relationship Analysis', 
+                fontsize=20, fontweight='bold', y=0.95)
+    plt.tight_layout()
+    plt.savefig(os.path.join('result', 'vix_sp500_relationship.png'), dpi=dpi, bbox_inches='tight', facecolor=COLORS['background'])
+    plt.close()
+
+def plot_recovery_analysis(recovery_df, dpi=300):
+    """Plot recovery time analysis"""
+    setup_style()
+    print("Plotting recovery time analysis...")
+    
+    if len(recovery_df) == 0:
+        print("Insufficient data for recovery time analysis")
+        return
+        
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.patch.set_facecolor(COLORS['background'])
+    axes = axes.flatten()
+    
+    # 1. VIX vs Maximum Drawdown
+    ax1 = axes[0]
+    ax1.set_facecolor(COLORS['background'])
+    scatter = ax1.scatter(recovery_df['vix_value'], recovery_df['drawdown'], 
+                         s=100, alpha=0.7, color=COLORS['secondary'])
+    ax1.set_xlabel('VIX Peak Value', fontsize=14, fontweight='bold')
+    ax1.set_ylabel('Maximum Drawdown', fontsize=14, fontweight='bold')
+    ax1.yaxis.set_major_formatter(PercentFormatter(1.0))
+    
+    # Add trend line
+    z = np.polyfit(recovery_df['vix_value'], recovery_df['drawdown'], 1)
+    p = np.poly1d(z)
+    ax1.plot(recovery_df['vix_value'], p(recovery_df['vix_value']), 
+             color=COLORS['primary'], linestyle='--', alpha=0.7, linewidth=2)
+    
+    # Calculate correlation
+    corr = np.corrcoef(recovery_df['vix_value'], recovery_df['drawdown'])[0, 1]
+    ax1.set_title(f'VIX Peak vs Maximum Drawdown\n(Correlation: {corr:.2f})', 
+                 fontsize=16, fontweight='bold', pad=20)
+
+    # 2. VIX vs Recovery Time
+    ax2 = axes[1]
+    ax2.set_facecolor(COLORS['background'])
+    scatter = ax2.scatter(recovery_df['vix_value'], recovery_df['recovery_days'], 
+                         s=100, alpha=0.7, color=COLORS['secondary'])
+    ax2.set_xlabel('VIX Peak Value', fontsize=14, fontweight='bold')
+    ax2.set_ylabel('Recovery Days', fontsize=14, fontweight='bold')
+    
+    # Add trend line
+    z = np.polyfit(recovery_df['vix_value'], recovery_df['recovery_days'], 1)
+    p = np.poly1d(z)
+    ax2.plot(recovery_df['vix_value'], p(recovery_df['vix_value']), 
+             color=COLORS['primary'], linestyle='--', alpha=0.7, linewidth=2)
+    
+    # Calculate correlation
+    corr = np.corrcoef(recovery_df['vix_value'], recovery_df['recovery_days'])[0, 1]
+    ax2.set_title(f'VIX Peak vs Recovery Time\n(Correlation: {corr:.2f})', 
+                 fontsize=16, fontweight='bold', pad=20)
+    
+    # 3. Maximum Drawdown vs Recovery Time
+    ax3 = axes[2]
+    ax3.set_facecolor(COLORS['background'])
+    scatter = ax3.scatter(recovery_df['drawdown'], recovery_df['recovery_days'], 
+                         s=100, alpha=0.7, color=COLORS['secondary'])
+    ax3.set_xlabel('Maximum Drawdown', fontsize=14, fontweight='bold')
+    ax3.set_ylabel('Recovery Days', fontsize=14, fontweight='bold')
+    ax3.xaxis.set_major_formatter(PercentFormatter(1.0))
+    
+    # Add trend line
+    z = np.polyfit(recovery_df['drawdown'], recovery_df['recovery_days'], 1)
+    p = np.poly1d(z)
+    ax3.plot(recovery_df['drawdown'], p(recovery_df['drawdown']), 
+             color=COLORS['primary'], linestyle='--', alpha=0.7, linewidth=2)
+    
+    # Calculate correlation
+    corr = np.corrcoef(recovery_df['drawdown'], recovery_df['recovery_days'])[0, 1]
+    ax3.set_title(f'Maximum Drawdown vs Recovery Time\n(Correlation: {corr:.2f})', 
+                 fontsize=16, fontweight='bold', pad=20)
+    
+    # 4. Recovery Days Timeline
+    ax4 = axes[3]
+    ax4.set_facecolor(COLORS['background'])
+    bars = ax4.bar(recovery_df['peak_date'].astype(str), recovery_df['recovery_days'], 
+                   alpha=0.7, color=COLORS['primary'])
+    
+    # Add VIX value labels to each bar
+    for i, bar in enumerate(bars):
+        height = bar.get_height()
+        vix_value = recovery_df['vix_value'].iloc[i]
+        ax4.text(bar.get_x() + bar.get_width()/2., height + 5,
+                f'VIX:{vix_value:.1f}', ha='center', va='bottom', 
+                rotation=45, fontsize=8, color=COLORS['secondary'])
+    
+    ax4.set_xticklabels(recovery_df['peak_date'].dt.strftime('%Y-%m-%d'), 
+                       rotation=45, ha='right')
+    ax4.set_ylabel('Recovery Days', fontsize=14, fontweight='bold')
+    ax4.set_title('Market Recovery Time After Historical VIX Peaks', 
+                 fontsize=16, fontweight='bold', pad=20)
+    
+    plt.tight_layout()
+    plt.savefig(os.path.join('result', 'vix_recovery_analysis.png'), dpi=dpi, bbox_inches='tight', 
+                facecolor=COLORS['background'])
+    plt.close()
+
+def plot_future_returns_by_vix(results, dpi=300):
+    """Plot future returns by VIX levels"""
+    setup_style()
+    print("Plotting future returns by VIX levels...")
+    
+    periods = list(results.keys())
+    categories = list(dict.fromkeys(category for period in periods for category in results[period]))
+    
+    # Prepare data
+    mean_returns = {}
+    for period in periods:
+        mean_returns[period] = []
+        for category in categories:
+            if category in results[period]:
+                mean_returns[period].append(results[period][category]['mean'])
+            else:
+                mean_returns[period].append(np.nan)
+    
+    # Create figure with correct size
+    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig.patch.set_facecolor(COLORS['background'])
+    axes = axes.flatten()
+    
+    # 1. Average future returns by VIX level (by period)
+    for i, period in enumerate(periods[:4]):  # Use first 4 periods
+        ax = axes[i]
+        ax.set_facecolor(COLORS['background'])
+        bars = ax.bar(categories, mean_returns[period], alpha=0.7, color=COLORS['primary'])
+        
+        # Add value labels inside bars
+        for bar in bars:
+            height = bar.get_height()
+            if not np.isnan(height):
+                # Set label color
+                color = 'white' #if abs(height) > 0.1 else COLORS['neutral']
+                # Set label position
+                if height > 0:
+                    y_pos = height / 2  # Positive value in bar middle
+                else:
+                    y_pos = height / 2  # Negative value in bar middle
+                
+                ax.text(bar.get_x() + bar.get_width()/2., y_pos,
+                       f'{height:.1%}', ha='center', va='center',
+                       color=color, fontweight='bold', fontsize=10)
+        
+        ax.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
+        ax.set_title(f'VIX Level vs Future {period} Return', 
+                   fontsize=16, fontweight='bold', pad=20)
+        ax.set_ylabel('Average Return', fontsize=14, fontweight='bold')
+        ax.set_xlabel('VIX Range', fontsize=14, fontweight='bold')
+        ax.yaxis.set_major_formatter(PercentFormatter(1.0))
+        
+        # Adjust y-axis range to ensure enough space for label
+        y_min, y_max = ax.get_ylim()
+        ax.set_ylim(y_min * 1.1, y_max * 1.1)
+    
+    plt.tight_layout()
+    plt.savefig(os.path.join('result', 'vix_future_returns.png'), dpi=dpi, bbox_inches='tight', 
+                facecolor=COLORS['background'])
+    plt.close()
+    
+    # 2. Return comparison across periods (by VIX level)
+    plt.figure(figsize=(16, 10))
+    plt.gca().set_facecolor(COLORS['background'])
+    
+    bar_width = 0.15
+    index = np.arange(len(categories))
+    
+    colors = [COLORS['primary'], COLORS['secondary'], COLORS['accent'], 
+             COLORS['success'], COLORS['neutral']]
+    
+    # Draw bar chart and add labels
+    for i, period in enumerate(periods[:5]):  # Use first 5 periods
+        values = mean_returns[period]
+        bars = plt.bar(index + i*bar_width, values, bar_width, alpha=0.7, 
+                label=period, color=colors[i % len(colors)])
+        
+        # Add labels inside bars
+        for bar in bars:
+            height = bar.get_height()
+            if not np.isnan(height):
+                # Set label color
+                color = 'white' if abs(height) > 0.1 else COLORS['neutral']
+                # Set label position
+                if height > 0:
+                    y_pos = height / 2  # Positive value in bar middle
+                else:
+                    y_pos = height / 2  # Negative value in bar middle
+                
+                plt.text(bar.get_x() + bar.get_width()/2., y_pos,
+                        f'{height:.1%}', ha='center', va='center',
+                        color=color, fontweight='bold', fontsize=8)
+    
+    plt.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
+    plt.xlabel('VIX Range', fontsize=16, fontweight='bold')
+    plt.ylabel('Average Return', fontsize=16, fontweight='bold')
+    plt.title('Future Returns Comparison Across Different VIX Levels', 
+             fontsize=20, fontweight='bold', pad=20)
+    plt.xticks(index + bar_width * 2, categories, fontsize=12)
+    plt.legend(fontsize=12, frameon=True, facecolor='white')
+    plt.grid(axis='y', alpha=0.3, color=COLORS['grid'])
+    plt.gca().yaxis.set_major_formatter(PercentFormatter(1.0))
+    
+    # Adjust y-axis range
+    y_min, y_max = plt.gca().get_ylim()
+    plt.ylim(y_min * 1.1, y_max * 1.1)
+    
+    plt.tight_layout()
+    plt.savefig(os.path.join('result', 'vix_future_returns_comparison.png'), dpi=dpi, bbox_inches='tight', 
+                facecolor=COLORS['background'])
+    plt.close()
@@ -0,0 +1,160 @@
+import cProfile
+import csv
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Fields recorded for every stage
+FIELDS = ['stage', 'parent', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rss_growth_mb', 'alloc_mb', 'alloc_peak_mb']
+
+_active = None
+
+
+def _peak_rss_mb():
+    """High-water mark of the resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Profiler:
+    """Records wall time, CPU time and peak RSS of pipeline stages
+
+    With detailed=True allocations are traced as well (tracemalloc slows
+    the whole run down, so it is off otherwise) and every top-level stage
+    also runs under cProfile and keeps tracemalloc snapshots, so the
+    slowest one can be dumped afterwards.
+    """
+
+    def __init__(self, detailed=False):
+        self.detailed = detailed
+        self.records = []
+        self._stack = []
+        self._details = {}
+        self._started_tracing = False
+        self._tracing = False
+
+    def start(self):
+        """Make this the active profiler used by stage()"""
+        global _active
+        if self.detailed and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracing = True
+        # Allocations are also recorded when someone else is already tracing
+        self._tracing = tracemalloc.is_tracing()
+        _active = self
+        return self
+
+    def stop(self):
+        global _active
+        _active = None
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        parent = self._stack[-1]['name'] if self._stack else ''
+        top_level = not self._stack
+        # peak: highest traced memory seen by nested stages, which reset the tracemalloc peak
+        entry = {'name': name, 'peak': 0}
+        self._stack.append(entry)
+
+        profile = snapshot = None
+        if self.detailed and top_level:
+            snapshot = tracemalloc.take_snapshot()
+            profile = cProfile.Profile()
+            profile.enable()
+
+        if self._tracing:
+            alloc_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        rss_before = _peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            allocations = {}
+            if self._tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, entry['peak'])
+                allocations = {'alloc_mb': (current - alloc_before) / 2 ** 20,
+                               'alloc_peak_mb': (peak - alloc_before) / 2 ** 20}
+            if profile is not None:
+                profile.disable()
+                self._details[name] = (profile, snapshot, tracemalloc.take_snapshot())
+            self._stack.pop()
+            if self._stack and self._tracing:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            self.add(name, parent=parent, wall_s=wall, cpu_s=cpu, peak_rss_mb=_peak_rss_mb(),
+                     rss_growth_mb=_peak_rss_mb() - rss_before, **allocations)
+
+    def add(self, name, parent='', **metrics):
+        """Record a stage measured elsewhere (e.g. in a worker process)"""
+        self.records.append({'stage': name, 'parent': parent, **metrics})
+
+    def slowest_stage(self):
+        """Top-level stage that spent the most CPU time in this process
+
+        CPU time rather than wall time, so a stage that only waits on worker
+        processes (whose own timings are recorded separately) isn't picked.
+        """
+        top_level = [record for record in self.records if record['stage'] in self._details]
+        return max(top_level, key=lambda record: record['cpu_s'])['stage'] if top_level else None
+
+    def write(self, directory, name='profile'):
+        """Write the stage table as JSON and CSV, plus the detailed dump of the slowest stage"""
+        with open(os.path.join(directory, f'{name}.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, indent=2)
+        with open(os.path.join(directory, f'{name}.csv'), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.records)
+
+        stage = self.slowest_stage()
+        if stage is None:
+            return None
+        profile, before, after = self._details[stage]
+        profile.dump_stats(os.path.join(directory, f'{name}_slowest.prof'))
+        text = io.StringIO()
+        text.write(f"Slowest stage: {stage}\n\n")
+        pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(30)
+        text.write("\nTop allocations (tracemalloc, by line)\n")
+        for diff in after.compare_to(before, 'lineno')[:20]:
+            text.write(f"{diff}\n")
+        with open(os.path.join(directory, f'{name}_slowest.txt'), 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+        return stage
+
+
+@contextmanager
+def stage(name):
+    """Measure a stage with the active profiler, if any"""
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name):
+            yield
+
+
+def record(name, parent='', **metrics):
+    """Add externally measured stage metrics to the active profiler, if any"""
+    if _active is not None:
+        _active.add(name, parent=parent, **metrics)
+
+
+def measure(function, *args, **kwargs):
+    """Call function and return (result, metrics) without a profiler, for worker processes"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = function(*args, **kwargs)
+    return result, {
+        'wall_s': time.perf_counter() - wall,
+        'cpu_s': time.process_time() - cpu,
+        'peak_rss_mb': _peak_rss_mb()
+    }
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+
+class PriceIndex:
+    """Sparse tables of range max/min over a price array
+
+    Level k holds the max (min) of every run of 2**k prices, which answers
+    "first index at or above (below) a level" with one vectorized binary
+    lifting pass and range min/max queries in O(1). Only the levels needed
+    for spans up to `max_span` are built.
+    """
+
+    def __init__(self, prices, max_span):
+        self.prices = np.asarray(prices, dtype=float)
+        self.max_span = max_span
+        self.range_max = [self.prices]
+        self.range_min = [self.prices]
+        size = 1
+        while size * 2 <= max(max_span, 1) and size * 2 <= len(self.prices):
+            self.range_max.append(np.maximum(self.range_max[-1][:-size], self.range_max[-1][size:]))
+            self.range_min.append(np.minimum(self.range_min[-1][:-size], self.range_min[-1][size:]))
+            size *= 2
+
+    def window_min(self, start, span):
+        """Minimum of prices[start:start + span] (span clipped to the end of the data)"""
+        start = np.asarray(start, dtype=np.int64)
+        length = np.minimum(start + span, len(self.prices)) - start
+        level = np.floor(np.log2(length)).astype(np.int64)
+        result = np.empty(len(start))
+        for k in np.unique(level):
+            rows = level == k
+            table = self.range_min[k]
+            result[rows] = np.minimum(table[start[rows]], table[start[rows] + length[rows] - (1 << k)])
+        return result
+
+    def _first(self, start, level, span, tables, blocked):
+        """First index in [start, start + span) whose price is not `blocked` by level, -1 if none"""
+        start = np.asarray(start, dtype=np.int64)
+        level = np.asarray(level, dtype=float)
+        n = len(self.prices)
+        pos = start.copy()
+        # Skip the largest runs of prices that are entirely blocked
+        for k in range(len(tables) - 1, -1, -1):
+            table = tables[k]
+            fits = pos + (1 << k) <= n
+            skip = np.zeros(len(pos), dtype=bool)
+            skip[fits] = blocked(table[pos[fits]], level[fits])
+            pos += skip * (1 << k)
+        end = np.minimum(start + span, n)
+        found = pos < end
+        found[found] = ~blocked(self.prices[pos[found]], level[found])
+        return np.where(found, pos, -1)
+
+    def first_at_or_above(self, start, level, span):
+        """First index in [start, start + span) with price >= level, -1 if none"""
+        return self._first(start, level, span, self.range_max, np.less)
+
+    def first_at_or_below(self, start, level, span):
+        """First index in [start, start + span) with price <= level, -1 if none"""
+        return self._first(start, level, span, self.range_min, np.greater)
+
+
+def recovery_events(prices, peak_idx, trough_lookahead=250, recovery_horizon=750, index=None, lows=None):
+    """Drawdown and recovery after each peak, computed for all peaks at once
+
+    For each peak the trough is the first lowest price within
+    `trough_lookahead` rows (peaks whose price never drops are dropped), and
+    recovery is the first row within `recovery_horizon` rows of the trough
+    whose price is back at the peak price. With `lows` (intraday lows) the
+    trough and drawdown are measured on those instead of on `prices`, and
+    the trough window starts on the row after the peak: the peak day's low
+    came before the close the peak is measured at.
+    Returns a dict of arrays for the peaks that recovered.
+    """
+    if index is None:
+        index = PriceIndex(prices, max(trough_lookahead, recovery_horizon))
+    prices = index.prices
+    low_index = index if lows is None else PriceIndex(lows, trough_lookahead)
+    peak_idx = np.asarray(peak_idx, dtype=np.int64)
+    start = peak_idx if lows is None else peak_idx + 1
+    peak_idx, start = peak_idx[start < len(prices)], start[start < len(prices)]
+    peak_value = prices[peak_idx]
+
+    # Troughs: lowest price in the lookahead window, first occurrence
+    lowest_value = low_index.window_min(start, trough_lookahead)
+    fell = lowest_value < peak_value
+    peak_idx, start, peak_value, lowest_value = peak_idx[fell], start[fell], peak_value[fell], lowest_value[fell]
+    trough_idx = low_index.first_at_or_below(start, lowest_value, trough_lookahead)
+
+    # Recovery: first price back at the peak level after the trough
+    recovery_idx = index.first_at_or_above(trough_idx, peak_value, recovery_horizon)
+    recovered = recovery_idx >= 0
+
+    return {
+        'peak_idx': peak_idx[recovered],
+        'trough_idx': trough_idx[recovered],
+        'recovery_idx': recovery_idx[recovered],
+        'drawdown': (lowest_value / peak_value - 1)[recovered],
+    }
+
+
+def recovery_table(data, peak_positions, trough_lookahead=250, recovery_horizon=750, index=None,
+                   low_column=None, vix_column='VIX'):
+    """One row per recovered peak: peak/trough/recovery dates, drawdown and recovery days
+
+    low_column names the S&P 500 intraday lows the drawdown is measured on
+    (default: the closes), vix_column the VIX value reported for each peak.
+    """
+    lows = None if low_column is None else data[low_column].to_numpy(dtype=float)
+    events = recovery_events(data['SP500'].to_numpy(), peak_positions, trough_lookahead, recovery_horizon,
+                             index=index, lows=lows)
+    if len(events['peak_idx']) == 0:
+        return pd.DataFrame()
+
+    peak_dates = data.index[events['peak_idx']]
+    recovery_dates = data.index[events['recovery_idx']]
+    return pd.DataFrame({
+        'peak_date': peak_dates,
+        'vix_value': data[vix_column].to_numpy()[events['peak_idx']],
+        'lowest_point_date': data.index[events['trough_idx']],
+        'drawdown': events['drawdown'],
+        'recovery_date': recovery_dates,
+        'recovery_days': (recovery_dates - peak_dates).days
+    })
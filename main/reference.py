@@ -0,0 +1,129 @@
+import pandas as pd
+
+# The original row-by-row implementations of the analysis functions, kept
+# unchanged (minus progress messages) as the correctness oracle for the
+# optimized code paths checked by benchmark.py. Far too slow for real data.
+
+
+def load_data(vix_path, gspc_path):
+    """Load data"""
+    vix_data = pd.read_csv(vix_path, index_col='date', parse_dates=True)
+    gspc_data = pd.read_csv(gspc_path, index_col='date', parse_dates=True)
+
+    # Merge data
+    data = pd.DataFrame({
+        'VIX': vix_data['adjclose'],
+        'SP500': gspc_data['adjclose']
+    })
+
+    # Calculate future returns for S&P 500
+    for period in [20, 60, 120, 250, 500, 750, 1250]:
+        data[f'SP500_{period}d_return'] = gspc_data['adjclose'].shift(-period) / gspc_data['adjclose'] - 1
+
+    # Calculate VIX relative levels
+    data['VIX_percentile_1y'] = data['VIX'].rolling(250).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    data['VIX_percentile_2y'] = data['VIX'].rolling(500).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    data['VIX_percentile_all'] = data['VIX'].expanding().apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+
+    # Calculate VIX historical highs
+    data['VIX_1y_max'] = data['VIX'].rolling(250).max()
+    data['VIX_is_1y_high'] = (data['VIX'] == data['VIX_1y_max']).astype(int)
+
+    # Calculate VIX N-day change rates
+    for period in [5, 10, 20]:
+        data[f'VIX_{period}d_change'] = data['VIX'].pct_change(period)
+
+    return data.dropna()
+
+
+def identify_vix_peaks(data, percentile_threshold=0.9, window=20):
+    """Identify VIX peaks"""
+    # Use rolling window to identify local peaks
+    data['is_local_peak'] = False
+    for i in range(window, len(data) - window):
+        if (data['VIX'].iloc[i] > data['VIX'].iloc[i-window:i].max()) and \
+           (data['VIX'].iloc[i] > data['VIX'].iloc[i+1:i+window+1].max()) and \
+           (data['VIX_percentile_all'].iloc[i] > percentile_threshold):
+            data.loc[data.index[i], 'is_local_peak'] = True
+
+    # Identify absolute peaks (top N% of historical data)
+    data['is_extreme_peak'] = data['VIX_percentile_all'] > 0.95
+
+    return data
+
+
+def calculate_recovery_time(data):
+    """Calculate recovery time from VIX peaks to market recovery"""
+    # Create separate DataFrame for each peak
+    peak_dates = data[data['is_local_peak']].index
+    recovery_times = []
+
+    for peak_date in peak_dates:
+        peak_idx = data.index.get_loc(peak_date)
+        sp500_peak_value = data['SP500'].iloc[peak_idx]
+        vix_peak_value = data['VIX'].iloc[peak_idx]
+
+        # Find lowest point
+        lowest_point_idx = None
+        lowest_value = sp500_peak_value
+        for i in range(peak_idx, min(peak_idx + 250, len(data))):
+            if data['SP500'].iloc[i] < lowest_value:
+                lowest_value = data['SP500'].iloc[i]
+                lowest_point_idx = i
+
+        if lowest_point_idx is None:
+            continue
+
+        # Calculate drawdown
+        drawdown = (lowest_value / sp500_peak_value) - 1
+
+        # Find recovery point
+        recovery_idx = None
+        for i in range(lowest_point_idx, min(lowest_point_idx + 750, len(data))):
+            if data['SP500'].iloc[i] >= sp500_peak_value:
+                recovery_idx = i
+                break
+
+        if recovery_idx is not None:
+            recovery_time = (data.index[recovery_idx] - peak_date).days
+            recovery_times.append({
+                'peak_date': peak_date,
+                'vix_value': vix_peak_value,
+                'lowest_point_date': data.index[lowest_point_idx],
+                'drawdown': drawdown,
+                'recovery_date': data.index[recovery_idx],
+                'recovery_days': recovery_time
+            })
+
+    recovery_df = pd.DataFrame(recovery_times)
+    return recovery_df
+
+
+def analyze_future_returns(data):
+    """Analyze future returns after VIX peaks"""
+    # Create VIX level categories
+    bins = [0, 20, 30, 40, 50, 100]
+    labels = ['<20', '20-30', '30-40', '40-50', '>50']
+    data['VIX_category'] = pd.cut(data['VIX'], bins=bins, labels=labels, right=False)
+
+    # Analyze future returns for high VIX levels
+    periods = [20, 60, 120, 250, 500, 750, 1250]
+    period_names = ['1 month', '3 months', '6 months', '1 year', '2 years', '3 years', '5 years']
+
+    results = {}
+    for i, period in enumerate(periods):
+        returns_by_category = {}
+        for category in labels:
+            category_returns = data[data['VIX_category'] == category][f'SP500_{period}d_return']
+            if len(category_returns) > 0:
+                returns_by_category[category] = {
+                    'mean': category_returns.mean(),
+                    'median': category_returns.median(),
+                    'min': category_returns.min(),
+                    'max': category_returns.max(),
+                    'positive_prob': (category_returns > 0).mean(),
+                    'count': len(category_returns)
+                }
+        results[period_names[i]] = returns_by_category
+
+    return results
@@ -0,0 +1,176 @@
+import argparse
+import re
+import time
+
+import numpy as np
+
+from returns_stats import PERIOD_NAMES, PERIODS, STAT_NAMES, grouped_return_stats
+from vix_index import load_data
+
+# Comparison operators of a condition; 'between' takes (low, high), both inclusive
+OPERATORS = ['<', '<=', '>', '>=', '==', 'between']
+
+_NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?%?'
+# One condition and the separator after it: "VIX between 28 and 33", "VIX_20d_change > 50%", ...
+_CONDITION = re.compile(rf'\s*(\w+)\s*(?:between\s+({_NUMBER})\s+and\s+({_NUMBER})|(<=|>=|==|<|>|=)\s*({_NUMBER}))'
+                        rf'\s*(?:and\b|&|,|$)', re.IGNORECASE)
+
+
+def _number(text):
+    return float(text[:-1]) / 100 if text.endswith('%') else float(text)
+
+
+def parse_conditions(text):
+    """Conditions as (column, operator, value) tuples from text like
+
+    "VIX between 28 and 33 and VIX_20d_change > 50% and VIX_percentile_1y > 0.9"
+
+    Conditions are joined by "and", "&" or ","; percentages are fractions.
+    """
+    conditions = []
+    position = 0
+    while position < len(text.rstrip()):
+        match = _CONDITION.match(text, position)
+        if match is None:
+            raise ValueError(f"cannot parse condition at {text[position:].strip()!r}")
+        column, low, high, operator, value = match.groups()
+        if low is not None:
+            conditions.append((column, 'between', (_number(low), _number(high))))
+        else:
+            conditions.append((column, '==' if operator == '=' else operator, _number(value)))
+        position = match.end()
+    return conditions
+
+
+class SortedColumn:
+    """One column's values in sorted order, with each row's rank in that order
+
+    NaN values sort last and never match a condition. A condition maps to a
+    range [lo, hi) of ranks with two binary searches, and a row matches
+    exactly when its rank falls in the range.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        dtype = np.int32 if len(values) < 2 ** 31 else np.int64
+        self.order = np.argsort(values, kind='stable').astype(dtype)
+        self.values = values[self.order]
+        self.rank = np.empty(len(values), dtype=dtype)
+        self.rank[self.order] = np.arange(len(values), dtype=dtype)
+        self.n_valid = len(values) - int(np.isnan(values).sum())
+
+    def bounds(self, operator, value):
+        """Rank range [lo, hi) of the rows satisfying `column operator value`"""
+        values = self.values[:self.n_valid]
+        if operator == '<':
+            return 0, np.searchsorted(values, value, side='left')
+        if operator == '<=':
+            return 0, np.searchsorted(values, value, side='right')
+        if operator == '>':
+            return np.searchsorted(values, value, side='right'), self.n_valid
+        if operator == '>=':
+            return np.searchsorted(values, value, side='left'), self.n_valid
+        if operator == '==':
+            return np.searchsorted(values, value, side='left'), np.searchsorted(values, value, side='right')
+        if operator == 'between':
+            low, high = value
+            return np.searchsorted(values, low, side='left'), np.searchsorted(values, high, side='right')
+        raise ValueError(f"unknown operator {operator!r}, expected one of {', '.join(OPERATORS)}")
+
+
+class RegimeIndex:
+    """Sorted indexes over the load_data columns for conditional forward return queries
+
+    Every numeric column gets a SortedColumn once. A query first turns each
+    condition into its rank range, starts from the rows of the most
+    selective one and keeps those whose rank is inside every other range, so
+    the work grows with the number of matching rows rather than the length
+    of the history.
+    """
+
+    def __init__(self, data, columns=None):
+        self.data = data
+        if columns is None:
+            columns = [column for column in data.columns if data[column].dtype.kind in 'fiu']
+        self.columns = {column: SortedColumn(data[column].to_numpy(dtype=float)) for column in columns}
+        self._returns = {}
+
+    def select(self, conditions):
+        """Sorted row positions satisfying all (column, operator, value) conditions"""
+        ranges = []
+        for column, operator, value in conditions:
+            if column not in self.columns:
+                raise ValueError(f"no index on column {column!r}, indexed: {', '.join(self.columns)}")
+            ranges.append((column, *self.columns[column].bounds(operator, value)))
+        if not ranges:
+            return np.arange(len(self.data))
+
+        # Most selective condition first
+        ranges.sort(key=lambda item: item[2] - item[1])
+        column, lo, hi = ranges[0]
+        rows = self.columns[column].order[lo:hi]
+        for column, lo, hi in ranges[1:]:
+            rank = self.columns[column].rank[rows]
+            rows = rows[(rank >= lo) & (rank < hi)]
+        return np.sort(rows)
+
+    def _forward_returns(self, period):
+        """S&P 500 return over the next `period` rows, as analyze_future_returns takes it"""
+        if period not in self._returns:
+            column = f'SP500_{period}d_return'
+            if column in self.data:
+                self._returns[period] = self.data[column].to_numpy(dtype=float)
+            else:
+                sp500 = self.data['SP500']
+                self._returns[period] = (sp500.shift(-period) / sp500 - 1).to_numpy(dtype=float)
+        return self._returns[period]
+
+    def query(self, conditions, periods=None, period_names=None):
+        """Forward return statistics of the rows satisfying all conditions
+
+        conditions is a list of (column, operator, value) tuples or a string
+        for parse_conditions. Returns {period_name: {stat: value}} with the
+        STAT_NAMES of analyze_future_returns; as there, each period uses the
+        matching rows that have its return and periods without rows are
+        omitted.
+        """
+        if isinstance(conditions, str):
+            conditions = parse_conditions(conditions)
+        if periods is None:
+            periods, period_names = PERIODS, PERIOD_NAMES
+        elif period_names is None:
+            period_names = [f'{period} days' for period in periods]
+
+        rows = self.select(conditions)
+        results = {}
+        for period, period_name in zip(periods, period_names):
+            returns = self._forward_returns(period)[rows]
+            returns = returns[~np.isnan(returns)]
+            if len(returns) > 0:
+                stats = grouped_return_stats(np.zeros(len(returns), dtype=np.int64), returns[:, None], 1)
+                results[period_name] = {name: stats[name][0, 0] for name in STAT_NAMES}
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Forward S&P 500 returns under ad-hoc VIX conditions')
+    parser.add_argument('conditions', help='e.g. "VIX between 28 and 33 and VIX_20d_change > 50%%"')
+    parser.add_argument('--periods', type=int, nargs='+', default=None, help='Forward horizons in trading days')
+    parser.add_argument('--no-cache', action='store_true', help='Recompute features instead of using the data cache')
+    args = parser.parse_args(argv)
+
+    conditions = parse_conditions(args.conditions)
+    regimes = RegimeIndex(load_data(use_cache=not args.no_cache))
+    start = time.perf_counter()
+    results = regimes.query(conditions, args.periods)
+    elapsed = time.perf_counter() - start
+    print(f"Matching rows: {len(regimes.select(conditions))} ({elapsed * 1000:.2f} ms)\n")
+    print("| Period | Average Return | Median Return | Minimum Return | Maximum Return | Positive Return Probability | Sample Count |")
+    print("|--------|--------------|--------------|--------------|--------------|----------------------------|-------------|")
+    for period, stats in results.items():
+        print(f"| {period} | {stats['mean']:.2%} | {stats['median']:.2%} | {stats['min']:.2%} | {stats['max']:.2%} | "
+              f"{stats['positive_prob']:.2%} | {stats['count']} |")
+
+
+if __name__ == "__main__":
+    main()
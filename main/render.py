@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import sys
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import profiling
+
+# Chart resolution for normal runs and for --preview
+FULL_DPI = 300
+PREVIEW_DPI = 72
+# Input fingerprints of the charts drawn by the last run
+HASH_FILE = os.path.join('result', '.chart_hashes.json')
+
+
+def fingerprint(*objects):
+    """Stable hash of chart inputs (frames, arrays, dicts, scalars)"""
+    digest = hashlib.sha256()
+
+    def update(obj):
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            digest.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+            digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        elif isinstance(obj, np.ndarray):
+            digest.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, dict):
+            for key in obj:
+                digest.update(repr(key).encode())
+                update(obj[key])
+        elif isinstance(obj, (list, tuple)):
+            for item in obj:
+                update(item)
+        else:
+            digest.update(repr(obj).encode())
+
+    for obj in objects:
+        update(obj)
+    return digest.hexdigest()
+
+
+def _init_worker():
+    """Worker initializer: render off-screen, without the parent's profiling hooks"""
+    sys.setprofile(None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def _draw(function, args, dpi):
+    return profiling.measure(function, *args, dpi=dpi)[1]
+
+
+def _read_hashes():
+    if not os.path.exists(HASH_FILE):
+        return {}
+    with open(HASH_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def render_charts(jobs, dpi=FULL_DPI, workers=None, force=False):
+    """Draw charts concurrently in worker processes, skipping unchanged ones
+
+    jobs is a list of (function, args, output_files); each function is called
+    as function(*args, dpi=dpi) and must save its own output_files. A chart is
+    skipped when its files exist and were drawn at the same dpi from inputs
+    with the same fingerprint. Returns the list of functions that were drawn.
+    """
+    hashes = _read_hashes()
+    pending = []
+    for function, args, outputs in jobs:
+        key = function.__name__
+        chart_hash = fingerprint(args, dpi)
+        if not force and hashes.get(key) == chart_hash and all(os.path.exists(path) for path in outputs):
+            print(f"Skipping {key}, data unchanged")
+            continue
+        pending.append((function, args, key, chart_hash))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1),
+                                 initializer=_init_worker) as pool:
+            futures = [(pool.submit(_draw, function, args, dpi), key, chart_hash)
+                       for function, args, key, chart_hash in pending]
+            for future, key, chart_hash in futures:
+                profiling.record(f'plot {key}', parent='plots', **future.result())
+                hashes[key] = chart_hash
+
+        with open(HASH_FILE, 'w', encoding='utf-8') as f:
+            json.dump(hashes, f, indent=2)
+    return [function for function, _, _, _ in pending]
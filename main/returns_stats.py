@@ -0,0 +1,64 @@
+import numpy as np
+
+STAT_NAMES = ['mean', 'median', 'min', 'max', 'positive_prob', 'count']
+
+# Default VIX categories (left-closed bins) and forward horizons
+VIX_BINS = [0, 20, 30, 40, 50, 100]
+VIX_LABELS = ['<20', '20-30', '30-40', '40-50', '>50']
+PERIODS = [20, 60, 120, 250, 500, 750, 1250]
+PERIOD_NAMES = ['1 month', '3 months', '6 months', '1 year', '2 years', '3 years', '5 years']
+
+
+def bucket_codes(values, bins):
+    """Bucket index of each value for left-closed bins, -1 outside the bins
+
+    Matches pd.cut(values, bins, right=False).
+    """
+    values = np.asarray(values, dtype=float)
+    codes = np.searchsorted(np.asarray(bins, dtype=float), values, side='right') - 1
+    codes[(codes >= len(bins) - 1) | np.isnan(values)] = -1
+    return codes
+
+
+def grouped_return_stats(codes, returns, n_buckets):
+    """Return statistics for every bucket and horizon in one pass
+
+    `returns` is an (n_rows, n_horizons) matrix. Rows are sorted by bucket
+    once, then each bucket's block is reduced across all horizons together,
+    so the cost grows with n_rows * n_horizons, not with the number of
+    (bucket, horizon) pairs. NaN returns are skipped like pandas does, but
+    still count as rows (count and positive_prob denominator).
+
+    Returns a dict of (n_buckets, n_horizons) arrays keyed by STAT_NAMES.
+    """
+    returns = np.asarray(returns, dtype=float)
+    n_horizons = returns.shape[1]
+    stats = {name: np.full((n_buckets, n_horizons), np.nan) for name in STAT_NAMES}
+    stats['count'] = np.zeros((n_buckets, n_horizons), dtype=np.int64)
+
+    inside = codes >= 0
+    order = np.argsort(codes[inside], kind='stable')
+    # Column-major so every horizon is reduced as a contiguous 1-D run
+    grouped = np.asfortranarray(returns[inside][order])
+    bounds = np.searchsorted(codes[inside][order], np.arange(n_buckets + 1))
+
+    for bucket in range(n_buckets):
+        block = grouped[bounds[bucket]:bounds[bucket + 1]]
+        if len(block) == 0:
+            continue
+        valid = ~np.isnan(block)
+        n_valid = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats['mean'][bucket] = np.nansum(block, axis=0) / n_valid
+        ordered = np.sort(block, axis=0)  # NaN sorts last
+        has_value = n_valid > 0
+        columns = np.flatnonzero(has_value)
+        lower = (n_valid[has_value] - 1) // 2
+        upper = n_valid[has_value] // 2
+        stats['median'][bucket, has_value] = (ordered[lower, columns] + ordered[upper, columns]) / 2
+        stats['min'][bucket, has_value] = ordered[0, columns]
+        stats['max'][bucket, has_value] = ordered[n_valid[has_value] - 1, columns]
+        stats['positive_prob'][bucket] = (block > 0).mean(axis=0)
+        stats['count'][bucket] = len(block)
+
+    return stats
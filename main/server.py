@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import vix_index
+from recovery import PriceIndex
+from regime import RegimeIndex, parse_conditions
+
+HOST = '127.0.0.1'
+PORT = 8765
+# Query results kept in memory
+CACHE_SIZE = 1024
+# Peak flag sets kept per (percentile_threshold, window)
+PEAK_CACHE_SIZE = 32
+# Longest trough lookahead / recovery horizon answered from the prebuilt price index
+MAX_SPAN = 1500
+# Largest request body accepted
+MAX_BODY = 1 << 20
+
+
+class LRUCache:
+    """Mapping that keeps the maxsize most recently used entries"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """Cached value of key (now the most recent), None if absent"""
+        if key not in self._items:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+
+def _jsonable(value):
+    """Plain JSON types for results holding numpy scalars, timestamps and NaN"""
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+def _list(params, name, cast):
+    """Comma-separated (query string) or JSON list parameter as a tuple, None when absent"""
+    value = params.get(name)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item]
+    elif not isinstance(value, list):
+        value = [value]
+    return tuple(cast(item) for item in value)
+
+
+def _date(params, name):
+    value = params.get(name)
+    return None if value is None else pd.Timestamp(value)
+
+
+def _check_params(params, allowed):
+    unknown = sorted(set(params) - set(allowed))
+    if unknown:
+        raise ValueError(f"unknown parameters: {', '.join(unknown)}")
+
+
+class QueryService:
+    """Warm analysis state answering queries, with results cached by their parameters
+
+    The analysis frame, the S&P 500 price index and the sorted column
+    indexes of the regime queries are built once. Each
+    query is normalized to a hashable key; results are kept as encoded JSON
+    in an LRU cache, and concurrent requests for the same key share one
+    computation. Computations run one at a time on a worker thread so the
+    event loop keeps answering cached queries meanwhile.
+    """
+
+    def __init__(self, data, cache_size=CACHE_SIZE):
+        self.data = data
+        self.index = PriceIndex(data['SP500'].to_numpy(), MAX_SPAN)
+        self.regimes = RegimeIndex(data)
+        self.cache = LRUCache(cache_size)
+        self._peak_frames = LRUCache(PEAK_CACHE_SIZE)
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # path -> (parameter parser, computation)
+        self.queries = {
+            '/returns': (self._parse_returns, self._returns),
+            '/peaks': (self._parse_peaks, self._peaks),
+            '/recovery': (self._parse_recovery, self._recovery),
+            '/regime': (self._parse_regime, self._regime)
+        }
+
+    def _parse_returns(self, params):
+        _check_params(params, ['bins', 'labels', 'periods', 'start', 'end'])
+        bins = _list(params, 'bins', float)
+        labels = _list(params, 'labels', str)
+        periods = _list(params, 'periods', int)
+        if bins is not None and (len(bins) < 2 or any(low >= high for low, high in zip(bins[:-1], bins[1:]))):
+            raise ValueError("bins must be at least two increasing edges")
+        if labels is not None and (bins is None or len(labels) != len(bins) - 1):
+            raise ValueError("labels need bins, one label per bin")
+        if periods is not None and (not periods or min(periods) <= 0):
+            raise ValueError("periods must be positive")
+        return bins, labels, periods, _date(params, 'start'), _date(params, 'end')
+
+    def _parse_peaks(self, params, extra=()):
+        _check_params(params, ['percentile_threshold', 'window', 'start', 'end', *extra])
+        window = int(params.get('window', 20))
+        if window <= 0:
+            raise ValueError("window must be positive")
+        return (float(params.get('percentile_threshold', 0.9)), window,
+                _date(params, 'start'), _date(params, 'end'))
+
+    def _parse_recovery(self, params):
+        peaks = self._parse_peaks(params, extra=['trough_lookahead', 'recovery_horizon'])
+        trough_lookahead = int(params.get('trough_lookahead', 250))
+        recovery_horizon = int(params.get('recovery_horizon', 750))
+        if trough_lookahead <= 0 or recovery_horizon <= 0:
+            raise ValueError("trough_lookahead and recovery_horizon must be positive")
+        return peaks + (trough_lookahead, recovery_horizon)
+
+    def _parse_regime(self, params):
+        _check_params(params, ['where', 'periods'])
+        if 'where' not in params:
+            raise ValueError("missing conditions ('where')")
+        conditions = tuple((column, operator, tuple(value) if operator == 'between' else value)
+                           for column, operator, value in parse_conditions(str(params['where'])))
+        for column, _, _ in conditions:
+            if column not in self.regimes.columns:
+                raise ValueError(f"no index on column {column!r}")
+        return conditions, _list(params, 'periods', int)
+
+    def _returns(self, bins, labels, periods, start, end):
+        """analyze_future_returns on the rows between start and end"""
+        data = self.data.loc[start:end]
+        return vix_index.analyze_future_returns(data, None if bins is None else list(bins),
+                                                None if labels is None else list(labels),
+                                                None if periods is None else list(periods))
+
+    def _peak_frame(self, percentile_threshold, window):
+        """Frame with the peak flags of the whole history for one parameter pair"""
+        key = (percentile_threshold, window)
+        frame = self._peak_frames.get(key)
+        if frame is None:
+            frame = vix_index.identify_vix_peaks(self.data[vix_index.PEAK_COLUMNS], percentile_threshold, window)
+            self._peak_frames.put(key, frame)
+        return frame
+
+    def _peaks(self, percentile_threshold, window, start, end):
+        """Peaks between start and end, detected on the whole history"""
+        frame = self._peak_frame(percentile_threshold, window)
+        peaks = frame[frame['is_local_peak']].loc[start:end]
+        return [{'date': date, 'vix': row.VIX, 'sp500': row.SP500, 'vix_percentile': row.VIX_percentile_all,
+                 'is_extreme_peak': row.is_extreme_peak} for date, row in zip(peaks.index, peaks.itertuples())]
+
+    def _recovery(self, percentile_threshold, window, start, end, trough_lookahead, recovery_horizon):
+        """calculate_recovery_time for the peaks between start and end"""
+        frame = self._peak_frame(percentile_threshold, window)
+        index = self.index if max(trough_lookahead, recovery_horizon) <= MAX_SPAN else None
+        recovery_df = vix_index.calculate_recovery_time(frame, trough_lookahead, recovery_horizon, index=index)
+        if len(recovery_df) == 0:
+            return []
+        in_range = np.ones(len(recovery_df), dtype=bool)
+        if start is not None:
+            in_range &= (recovery_df['peak_date'] >= start).to_numpy()
+        if end is not None:
+            in_range &= (recovery_df['peak_date'] <= end).to_numpy()
+        return recovery_df[in_range].to_dict('records')
+
+    def _regime(self, conditions, periods):
+        """Forward return statistics of the rows satisfying every condition"""
+        return self.regimes.query(list(conditions), None if periods is None else list(periods))
+
+    def _compute(self, run, args):
+        # The analysis functions print progress, which a server doesn't want
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run(*args)
+        return json.dumps(_jsonable(result)).encode()
+
+    async def _compute_and_cache(self, key, run, args):
+        try:
+            body = await asyncio.get_running_loop().run_in_executor(self._executor, self._compute, run, args)
+            self.cache.put(key, body)
+            return body
+        finally:
+            del self._pending[key]
+
+    async def query(self, path, params):
+        """Encoded JSON result of a query; raises KeyError for unknown paths, ValueError for bad parameters"""
+        parse, run = self.queries[path]
+        args = parse(params)
+        key = (path,) + args
+        body = self.cache.get(key)
+        if body is not None:
+            return body
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_and_cache(key, run, args))
+            self._pending[key] = task
+        return await task
+
+    def health(self):
+        return json.dumps({
+            'rows': len(self.data),
+            'start': self.data.index.min().strftime('%Y-%m-%d'),
+            'end': self.data.index.max().strftime('%Y-%m-%d'),
+            'cached_queries': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses
+        }).encode()
+
+    async def respond(self, method, target, body):
+        """(status, JSON body) for one request"""
+        url = urlsplit(target)
+        if method not in ('GET', 'POST'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, json.dumps({'error': f'method {method} not allowed'}).encode()
+        if url.path == '/health':
+            return HTTPStatus.OK, self.health()
+        if url.path not in self.queries:
+            return HTTPStatus.NOT_FOUND, json.dumps({'error': f'unknown query {url.path}'}).encode()
+        try:
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if body:
+                payload = json.loads(body)
+                if not isinstance(payload, dict):
+                    raise ValueError("request body must be a JSON object")
+                params.update(payload)
+            return HTTPStatus.OK, await self.query(url.path, params)
+        except (ValueError, TypeError) as e:
+            return HTTPStatus.BAD_REQUEST, json.dumps({'error': str(e)}).encode()
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                length = headers.get('content-length', '0')
+                length = int(length) if length.isdigit() else -1
+                if len(parts) != 3 or not 0 <= length <= MAX_BODY:
+                    status, body, keep_alive = HTTPStatus.BAD_REQUEST, b'{"error": "bad request"}', False
+                else:
+                    method, target, version = parts
+                    status, body = await self.respond(method, target, await reader.readexactly(length))
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+
+                writer.write(f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                             f'Content-Type: application/json\r\n'
+                             f'Content-Length: {len(body)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host=HOST, port=PORT, use_cache=True, cache_size=CACHE_SIZE):
+    """Load the data once and answer queries until cancelled"""
+    service = QueryService(vix_index.load_data(use_cache=use_cache), cache_size)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving VIX queries on http://{host}:{port} (/returns, /peaks, /recovery, /regime, /health)")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve VIX analysis queries over HTTP from warm in-memory state')
+    parser.add_argument('--host', default=HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='Query results kept in memory')
+    parser.add_argument('--no-cache', action='store_true', help='Recompute features instead of using the data cache')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, not args.no_cache, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
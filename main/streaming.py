@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from features import RETURN_PERIODS, TRAILING_LOOKBACK, assemble, forward_returns, trailing_features
+from percentile_rank import ExpandingPercentileRank
+
+# Rows read from each CSV file at a time
+CHUNK_ROWS = 250_000
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS, dtype=np.float32):
+    """Adjusted closes of a price CSV file, chunk_rows at a time
+
+    Only the date and adjclose columns are parsed, with an explicit dtype and
+    the ISO 8601 date format pinned, so pandas skips format inference.
+    """
+    reader = pd.read_csv(path, usecols=['date', 'adjclose'], dtype={'adjclose': dtype}, index_col='date',
+                         parse_dates=['date'], date_format='ISO8601', chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield chunk['adjclose']
+
+
+def aligned_prices(vix_path, gspc_path, chunk_rows=CHUNK_ROWS, dtype=np.float32):
+    """Merged VIX/SP500 rows in date order, as read_prices gives them, one block at a time
+
+    Both files must be sorted by date. A row is only released once no later
+    chunk of either file can still add a row at or before its date.
+    """
+    streams = {'VIX': read_chunks(vix_path, chunk_rows, dtype), 'SP500': read_chunks(gspc_path, chunk_rows, dtype)}
+    buffers = {name: None for name in streams}
+    finished = set()
+    while True:
+        # Read from the unfinished stream that is furthest behind
+        unfinished = [name for name in streams if name not in finished]
+        if unfinished:
+            name = min(unfinished, key=lambda name: buffers[name].index[-1]
+                       if buffers[name] is not None and len(buffers[name]) else pd.Timestamp.min)
+            chunk = next(streams[name], None)
+            if chunk is None:
+                finished.add(name)
+            else:
+                buffers[name] = chunk if buffers[name] is None else pd.concat([buffers[name], chunk])
+
+        unfinished = [name for name in streams if name not in finished]
+        if any(buffers[name] is None or len(buffers[name]) == 0 for name in unfinished):
+            continue
+        cutoff = min(buffers[name].index[-1] for name in unfinished) if unfinished else None
+
+        released = {}
+        for name, buffer in buffers.items():
+            if buffer is None:
+                continue
+            ready = np.ones(len(buffer), dtype=bool) if cutoff is None else buffer.index <= cutoff
+            released[name] = buffer[ready]
+            buffers[name] = buffer[~ready]
+        prices = pd.DataFrame({name: released.get(name, pd.Series(dtype=dtype)) for name in streams})
+        if len(prices):
+            yield prices
+        if not unfinished:
+            return
+
+
+def _release(pending, final):
+    """Split off the leading rows whose features are complete, dropping rows with missing values
+
+    A row's forward returns are known once max(RETURN_PERIODS) more S&P 500
+    prices have arrived (or never, when it has no S&P 500 price).
+    """
+    returns = forward_returns(pending['SP500'])
+    if final:
+        n_ready = len(pending)
+    else:
+        has_price = pending['SP500'].notna().to_numpy()
+        prices_after = has_price.sum() - np.cumsum(has_price)
+        waiting = has_price & (prices_after < max(RETURN_PERIODS))
+        n_ready = int(np.argmax(waiting)) if waiting.any() else len(pending)
+
+    ready = pending.iloc[:n_ready]
+    trailing = ready.drop(columns=['VIX', 'SP500', 'VIX_percentile_all'])
+    data = assemble(ready, returns.iloc[:n_ready], trailing, ready['VIX_percentile_all']).dropna()
+    return data, pending.iloc[n_ready:]
+
+
+def feature_chunks(vix_path, gspc_path, chunk_rows=CHUNK_ROWS, dtype=np.float32):
+    """Rows of the frame load_data builds, computed and yielded one chunk at a time
+
+    Rolling features of each chunk use the last TRAILING_LOOKBACK VIX values
+    before it, the expanding percentile keeps a histogram of the values seen,
+    and rows wait only until their forward returns are known, so working
+    memory depends on chunk_rows and not on the file size as long as the
+    consumer doesn't keep the chunks. Float columns are stored as `dtype`.
+    """
+    ranker = ExpandingPercentileRank()
+    vix_tail = None
+    pending = None
+
+    def cast(data):
+        return data.astype({column: dtype for column in data.columns if data[column].dtype.kind == 'f'}, copy=False)
+
+    for prices in aligned_prices(vix_path, gspc_path, chunk_rows, dtype):
+        # Trailing features of the new rows, from the VIX history just before them
+        vix = prices['VIX'] if vix_tail is None else pd.concat([vix_tail, prices['VIX']])
+        rows = pd.concat([prices, trailing_features(vix).iloc[len(vix) - len(prices):]], axis=1)
+        rows['VIX_percentile_all'] = ranker.update(prices['VIX'].to_numpy())
+        vix_tail = vix.iloc[-TRAILING_LOOKBACK:]
+
+        pending = rows if pending is None else pd.concat([pending, rows])
+        data, pending = _release(pending, final=False)
+        if len(data):
+            yield cast(data)
+    if pending is not None:
+        data = _release(pending, final=True)[0]
+        if len(data):
+            yield cast(data)
+
+
+def stream_features(vix_path, gspc_path, chunk_rows=CHUNK_ROWS, dtype=np.float32):
+    """The frame load_data builds, collected from feature_chunks
+
+    Parsing and feature buffers stay bounded by chunk_rows, but the result
+    holds every row, so memory still grows with the file size (half as fast
+    with float32). With float64 the result equals load_data exactly.
+    """
+    # Released rows, kept per column so the result is assembled one column at a time
+    index_parts = []
+    column_parts = {}
+    for data in feature_chunks(vix_path, gspc_path, chunk_rows, dtype):
+        index_parts.append(data.index)
+        for column in data.columns:
+            column_parts.setdefault(column, []).append(data[column].to_numpy())
+
+    index = index_parts[0].append(index_parts[1:]) if index_parts else pd.DatetimeIndex([], name='date')
+    columns = {column: np.concatenate(column_parts.pop(column)) for column in list(column_parts)}
+    return pd.DataFrame(columns, index=index, copy=False)
@@ -0,0 +1,134 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from peaks import peak_matrix
+from recovery import PriceIndex, recovery_events
+from vix_index import load_data
+
+RESULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'result')
+# Default grid
+PERCENTILE_THRESHOLDS = [round(0.80 + 0.01 * i, 2) for i in range(20)]
+WINDOWS = list(range(5, 61, 5))
+TROUGH_LOOKAHEADS = [60, 120, 250, 500]
+RECOVERY_HORIZONS = [250, 500, 750, 1000, 1500]
+
+# Per-process state shared by every configuration, set by _init_worker
+_state = {}
+
+
+def _init_worker(prices, max_span, dates, vix, candidates, membership):
+    """Build the shared price index once per process"""
+    _state.update(index=PriceIndex(prices, max_span), dates=dates, vix=vix,
+                  candidates=candidates, membership=membership)
+
+
+def _correlation(n, sx, sy, sxx, syy, sxy):
+    """Pearson correlation from sums, NaN when undefined"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sxy - sx * sy
+        return cov / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+
+
+def _sweep_recovery(trough_lookahead, recovery_horizon):
+    """Summary of every (threshold, window) peak set for one trough lookahead and recovery horizon
+
+    Recoveries are computed once for the union of all peak sets, then each
+    configuration's sums come out of one matrix product with its membership
+    column.
+    """
+    index, candidates, membership = _state['index'], _state['candidates'], _state['membership']
+    events = recovery_events(index.prices, candidates, trough_lookahead, recovery_horizon, index=index)
+    rows = np.searchsorted(candidates, events['peak_idx'])
+
+    # Recovered candidates only; the rest keep zero weight
+    recovered = np.zeros(len(candidates), dtype=bool)
+    recovered[rows] = True
+    vix = _state['vix'][candidates]
+    drawdown = np.zeros(len(candidates))
+    drawdown[rows] = events['drawdown']
+    days = np.zeros(len(candidates))
+    dates = _state['dates']
+    days[rows] = (dates[events['recovery_idx']] - dates[events['peak_idx']]).days
+
+    x, d, r = vix * recovered, drawdown, days
+    moments = np.column_stack([recovered, x, d, r, x * x, d * d, r * r, x * d, x * r, d * r])
+    n, sx, sd, sr, sxx, sdd, srr, sxd, sxr, sdr = (membership.T.astype(float) @ moments).T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'trough_lookahead': trough_lookahead,
+            'recovery_horizon': recovery_horizon,
+            'peak_count': membership.sum(axis=0),
+            'recovered_count': n.astype(np.int64),
+            'avg_drawdown': sd / n,
+            'avg_recovery_days': sr / n,
+            'vix_drawdown_corr': _correlation(n, sx, sd, sxx, sdd, sxd),
+            'vix_recovery_corr': _correlation(n, sx, sr, sxx, srr, sxr),
+            'drawdown_recovery_corr': _correlation(n, sd, sr, sdd, srr, sdr)
+        }
+
+
+def run_sweep(data, percentile_thresholds=PERCENTILE_THRESHOLDS, windows=WINDOWS,
+              trough_lookaheads=TROUGH_LOOKAHEADS, recovery_horizons=RECOVERY_HORIZONS, workers=None):
+    """Peak and recovery summary for every combination of the parameter grids
+
+    `data` is the frame from load_data. Peak flags for all (threshold,
+    window) pairs come from one peak_matrix call, and one price index sized
+    for the longest lookahead/horizon is shared by every configuration. The
+    (trough_lookahead, recovery_horizon) pairs are spread over worker
+    processes. Returns a tidy frame with one row per configuration.
+    """
+    flags = peak_matrix(data, percentile_thresholds, windows)
+    membership = flags.to_numpy()
+    # Every position that is a peak for at least one configuration
+    candidates = np.flatnonzero(membership.any(axis=1))
+    initargs = (data['SP500'].to_numpy(), max(max(trough_lookaheads), max(recovery_horizons)), data.index,
+                data['VIX'].to_numpy(), candidates, membership[candidates])
+
+    pairs = list(itertools.product(trough_lookaheads, recovery_horizons))
+    if workers == 1:
+        _init_worker(*initargs)
+        parts = [_sweep_recovery(*pair) for pair in pairs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            parts = list(pool.map(_sweep_recovery, *zip(*pairs)))
+
+    configs = flags.columns.to_frame(index=False)
+    return pd.concat([configs.assign(**part) for part in parts], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep peak and recovery parameters of the VIX analysis')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=PERCENTILE_THRESHOLDS,
+                        help='Historical percentile thresholds of a VIX peak')
+    parser.add_argument('--windows', type=int, nargs='+', default=WINDOWS,
+                        help='Local peak windows in rows on each side')
+    parser.add_argument('--trough-lookaheads', type=int, nargs='+', default=TROUGH_LOOKAHEADS,
+                        help='Rows after a peak searched for the trough')
+    parser.add_argument('--recovery-horizons', type=int, nargs='+', default=RECOVERY_HORIZONS,
+                        help='Rows after the trough searched for the recovery')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--no-cache', action='store_true', help='Recompute features instead of using the data cache')
+    parser.add_argument('--output', default=os.path.join(RESULT_DIR, 'sweep_results.csv'),
+                        help='Where to write the results table')
+    args = parser.parse_args(argv)
+
+    data = load_data(use_cache=not args.no_cache)
+    n_configs = len(args.thresholds) * len(args.windows) * len(args.trough_lookaheads) * len(args.recovery_horizons)
+    print(f"Evaluating {n_configs} configurations...")
+    start = time.perf_counter()
+    results = run_sweep(data, args.thresholds, args.windows, args.trough_lookaheads, args.recovery_horizons,
+                        args.workers)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+    results.to_csv(args.output, index=False)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
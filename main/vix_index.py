@@ -1,441 +1,213 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.ticker import PercentFormatter
 import os
+import argparse
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set Chinese font
-try:
-    plt.rcParams['font.sans-serif'] = ['Microsoft JhengHei'] 
-    plt.rcParams['axes.unicode_minus'] = False
-except:
-    pass
+from features import (RANGE_VOL_WINDOW, TRADING_DAYS, LazyFrame, build_features, complete_rows, feature_params,
+                      ohlc_features, read_ohlc, read_prices, warmup_start)
+from peaks import peak_flags
+from recovery import recovery_table
+from bootstrap import BOOTSTRAP_STATS, bootstrap_return_stats
+from returns_stats import (PERIOD_NAMES, PERIODS, STAT_NAMES, VIX_BINS, VIX_LABELS, bucket_codes,
+                           grouped_return_stats)
+import cache
+import incremental
+import profiling
+from streaming import stream_features
+from compact import compact_features
+from render import FULL_DPI, PREVIEW_DPI, render_charts
+from plots import (CHART_CORRELATIONS, plot_future_returns_by_vix, plot_recovery_analysis,
+                   plot_vix_sp500_relationship)
+from correlation import correlation_summary, rolling_correlations
 
-# Set chart style
-plt.style.use('seaborn-v0_8')
-sns.set_style("whitegrid", {'grid.linestyle': '--', 'grid.alpha': 0.3})
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+# Rows peak detection and recovery times use: those with all of these columns
+PEAK_COLUMNS = ['VIX', 'SP500', 'VIX_percentile_all']
+# ... in OHLC mode, where peaks are found on the VIX daily high and drawdowns measured on the S&P 500 low
+OHLC_PEAK_COLUMNS = ['VIX_high', 'SP500', 'VIX_high_percentile_all', 'SP500_low']
 
-# Set chart size and font
-plt.rcParams['figure.figsize'] = (16, 10)
-plt.rcParams['figure.dpi'] = 300
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.size'] = 12
-plt.rcParams['axes.titlesize'] = 16
-plt.rcParams['axes.labelsize'] = 14
-plt.rcParams['xtick.labelsize'] = 12
-plt.rcParams['ytick.labelsize'] = 12
+def load_data(vix_path=None, gspc_path=None, use_cache=True, stream=False, compact=False, lazy=False, ohlc=False):
+    """Load data
 
-# Define color scheme
-COLORS = {
-    'primary': '#2E86C1',  # Blue
-    'secondary': '#E74C3C',  # Red
-    'accent': '#F39C12',  # Orange
-    'neutral': '#95A5A6',  # Gray
-    'success': '#27AE60',  # Green
-    'background': '#F8F9FA',  # Light gray background
-    'grid': '#E0E0E0'  # Grid line color
-}
-
-def load_data():
-    """Load data"""
+    The merged frame with derived features is cached on disk, keyed by the
+    content of the CSV files and the feature parameters. With stream=True the
+    CSV files are read in chunks with float32 prices and features, which keeps
+    the parsing buffers bounded on long intraday histories (the frame still
+    holds every row). With compact=True a CompactFrame
+    (float32 features, forward returns computed on request) is returned
+    instead, uncached. With lazy=True a LazyFrame of the merged rows from the
+    end of the rolling/expanding feature warm-up is returned, recent rows
+    included: each derived column is computed when an analysis first asks
+    for it, and each analysis only drops the rows missing the columns it uses.
+    With ohlc=True the VIX high and S&P 500 open/high/low/close are read as
+    well, adding VIX_high, VIX_high_percentile_all, SP500_low and the
+    S&P 500 Parkinson and Garman-Klass volatilities.
+    """
     print("Loading data...")
-    vix_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', '^vix.csv')
-    gspc_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', '^GSPC.csv')
-    
-    vix_data = pd.read_csv(vix_path, index_col='date', parse_dates=True)
-    gspc_data = pd.read_csv(gspc_path, index_col='date', parse_dates=True)
-    
-    # Merge data
-    data = pd.DataFrame({
-        'VIX': vix_data['adjclose'],
-        'SP500': gspc_data['adjclose']
-    })
-    
-    # Calculate future returns for S&P 500
-    for period in [20, 60, 120, 250, 500, 750, 1250]:
-        data[f'SP500_{period}d_return'] = gspc_data['adjclose'].shift(-period) / gspc_data['adjclose'] - 1
-    
-    # Calculate VIX relative levels
-    data['VIX_percentile_1y'] = data['VIX'].rolling(250).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
-    data['VIX_percentile_2y'] = data['VIX'].rolling(500).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
-    data['VIX_percentile_all'] = data['VIX'].expanding().apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
-    
-    # Calculate VIX historical highs
-    data['VIX_1y_max'] = data['VIX'].rolling(250).max()
-    data['VIX_is_1y_high'] = (data['VIX'] == data['VIX_1y_max']).astype(int)
-    
-    # Calculate VIX N-day change rates
-    for period in [5, 10, 20]:
-        data[f'VIX_{period}d_change'] = data['VIX'].pct_change(period)
-    
-    return data.dropna()
+    vix_path = vix_path or os.path.join(DATA_DIR, '^vix.csv')
+    gspc_path = gspc_path or os.path.join(DATA_DIR, '^GSPC.csv')
+    
+    # Each mode builds a different frame, so at most one of them
+    modes = [name for name, enabled in [('stream', stream), ('compact', compact), ('lazy', lazy)] if enabled]
+    if len(modes) > 1:
+        raise ValueError(f"{' and '.join(modes)} can't be combined, pick one")
+    if ohlc and (stream or compact):
+        raise ValueError("ohlc mode can't be combined with stream or compact")
+    if compact:
+        return compact_features(read_prices(vix_path, gspc_path))
+    if lazy:
+        prices = read_ohlc(vix_path, gspc_path) if ohlc else read_prices(vix_path, gspc_path)
+        return LazyFrame(prices, start=warmup_start(prices['VIX']))
+    
+    if use_cache:
+        params = dict(feature_params(), dtype='float32' if stream else 'float64')
+        if ohlc:
+            params['ohlc'] = {'range_vol_window': RANGE_VOL_WINDOW, 'trading_days': TRADING_DAYS}
+        key = cache.cache_key([vix_path, gspc_path], params)
+        data = cache.read_frame(key)
+        if data is not None:
+            return data
+    
+    if stream:
+        data = stream_features(vix_path, gspc_path)
+    elif ohlc:
+        prices = read_ohlc(vix_path, gspc_path)
+        data = pd.concat([build_features(prices[['VIX', 'SP500']]), ohlc_features(prices)], axis=1).dropna()
+    else:
+        data = build_features(read_prices(vix_path, gspc_path)).dropna()
+    if use_cache:
+        cache.write_frame(key, data)
+    return data
+
+def identify_vix_peaks(data, percentile_threshold=0.9, window=20, ohlc=False):
+    """Identify VIX peaks
 
-def identify_vix_peaks(data, percentile_threshold=0.9, window=20):
-    """Identify VIX peaks"""
+    With ohlc=True peaks are found on the VIX daily high (load_data(ohlc=True)
+    frames), which also catches intraday spikes that closed well below
+    their high.
+    """
     print("Identifying VIX peaks...")
+    columns = OHLC_PEAK_COLUMNS if ohlc else PEAK_COLUMNS
+    value_column, percentile_column = columns[0], columns[2]
     # Use rolling window to identify local peaks
-    data['is_local_peak'] = False
-    for i in range(window, len(data) - window):
-        if (data['VIX'].iloc[i] > data['VIX'].iloc[i-window:i].max()) and \
-           (data['VIX'].iloc[i] > data['VIX'].iloc[i+1:i+window+1].max()) and \
-           (data['VIX_percentile_all'].iloc[i] > percentile_threshold):
-            data.loc[data.index[i], 'is_local_peak'] = True
+    rows = complete_rows(data, columns)
+    if rows.all():
+        data['is_local_peak'] = peak_flags(data, percentile_threshold, window, value_column, percentile_column)
+    else:
+        flags = np.zeros(len(data), dtype=bool)
+        flags[rows] = peak_flags(data[columns][rows], percentile_threshold, window, value_column, percentile_column)
+        data['is_local_peak'] = flags
     
     # Identify absolute peaks (top N% of historical data)
-    data['is_extreme_peak'] = data['VIX_percentile_all'] > 0.95
+    data['is_extreme_peak'] = data[percentile_column] > 0.95
     
     return data
 
-def calculate_recovery_time(data):
-    """Calculate recovery time from VIX peaks to market recovery"""
+def calculate_recovery_time(data, trough_lookahead=250, recovery_horizon=750, index=None, ohlc=False):
+    """Calculate recovery time from VIX peaks to market recovery
+
+    The trough is searched within trough_lookahead rows after each peak and
+    the recovery within recovery_horizon rows after the trough. `index` is an
+    optional PriceIndex of data['SP500'] built for spans at least that long,
+    reused across calls instead of being rebuilt. With ohlc=True drawdowns
+    and troughs are measured on the S&P 500 intraday low and peaks report
+    the VIX daily high.
+    """
     print("Calculating recovery time from VIX peaks to market recovery...")
-    # Create separate DataFrame for each peak
-    peak_dates = data[data['is_local_peak']].index
-    recovery_times = []
-    
-    for peak_date in peak_dates:
-        peak_idx = data.index.get_loc(peak_date)
-        sp500_peak_value = data['SP500'].iloc[peak_idx]
-        vix_peak_value = data['VIX'].iloc[peak_idx]
-        
-        # Find lowest point
-        lowest_point_idx = None
-        lowest_value = sp500_peak_value
-        for i in range(peak_idx, min(peak_idx + 250, len(data))):
-            if data['SP500'].iloc[i] < lowest_value:
-                lowest_value = data['SP500'].iloc[i]
-                lowest_point_idx = i
-        
-        if lowest_point_idx is None:
-            continue
-            
-        # Calculate drawdown
-        drawdown = (lowest_value / sp500_peak_value) - 1
-        
-        # Find recovery point
-        recovery_idx = None
-        for i in range(lowest_point_idx, min(lowest_point_idx + 750, len(data))):
-            if data['SP500'].iloc[i] >= sp500_peak_value:
-                recovery_idx = i
-                break
-        
-        if recovery_idx is not None:
-            recovery_time = (data.index[recovery_idx] - peak_date).days
-            recovery_times.append({
-                'peak_date': peak_date,
-                'vix_value': vix_peak_value,
-                'lowest_point_date': data.index[lowest_point_idx],
-                'drawdown': drawdown,
-                'recovery_date': data.index[recovery_idx],
-                'recovery_days': recovery_time
-            })
-    
-    recovery_df = pd.DataFrame(recovery_times)
+    columns = OHLC_PEAK_COLUMNS if ohlc else PEAK_COLUMNS
+    rows = complete_rows(data, columns)
+    if not rows.all():
+        data = data[columns + ['is_local_peak']][rows]
+    peak_positions = np.flatnonzero(data['is_local_peak'].to_numpy())
+    recovery_df = recovery_table(data, peak_positions, trough_lookahead, recovery_horizon, index=index,
+                                 low_column='SP500_low' if ohlc else None, vix_column=columns[0])
     return recovery_df
 
-def analyze_future_returns(data):
-    """Analyze future returns after VIX peaks"""
+def analyze_future_returns(data, bins=None, labels=None, periods=None, period_names=None,
+                           n_resamples=0, seed=0):
+    """Analyze future returns after VIX peaks
+
+    bins/labels define the VIX categories (left-closed) and periods the
+    forward horizons in trading days; return columns missing from data are
+    computed from SP500 on the fly. Each period uses the rows that have its
+    return, so short horizons also count the recent rows whose long-horizon
+    returns aren't known yet. With n_resamples > 0 the mean, median and
+    positive_prob also get 95% block bootstrap intervals ('mean_ci', ...).
+    """
     print("Analyzing future returns after VIX peaks...")
     # Create VIX level categories
-    bins = [0, 20, 30, 40, 50, 100]
-    labels = ['<20', '20-30', '30-40', '40-50', '>50']
-    data['VIX_category'] = pd.cut(data['VIX'], bins=bins, labels=labels, right=False)
+    if bins is None:
+        bins, labels = VIX_BINS, VIX_LABELS
+    elif labels is None:
+        labels = [f'{low}-{high}' for low, high in zip(bins[:-1], bins[1:])]
+    codes = bucket_codes(data['VIX'].to_numpy(), bins)
+    data['VIX_category'] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
     
     # Analyze future returns for high VIX levels
-    periods = [20, 60, 120, 250, 500, 750, 1250]
-    period_names = ['1 month', '3 months', '6 months', '1 year', '2 years', '3 years', '5 years']
+    if periods is None:
+        periods, period_names = PERIODS, PERIOD_NAMES
+    elif period_names is None:
+        period_names = [f'{period} days' for period in periods]
+    
+    # Returns matrix with one column per horizon
+    returns = np.column_stack([
+        data[f'SP500_{period}d_return'].to_numpy() if f'SP500_{period}d_return' in data
+        else (data['SP500'].shift(-period) / data['SP500'] - 1).to_numpy()
+        for period in periods
+    ])
+    if not np.isnan(returns).any():
+        stats = grouped_return_stats(codes, returns, len(labels))
+        if n_resamples > 0:
+            # Blocks as long as each horizon, the span its overlapping returns share
+            intervals = bootstrap_return_stats(codes, returns, len(labels), n_resamples,
+                                               block_lengths=periods, seed=seed)
+    else:
+        # One horizon at a time, on the rows that have its return
+        kept = [np.flatnonzero(~np.isnan(returns[:, i])) for i in range(len(periods))]
+        parts = [grouped_return_stats(codes[rows], returns[rows, i:i + 1], len(labels))
+                 for i, rows in enumerate(kept)]
+        stats = {name: np.hstack([part[name] for part in parts]) for name in STAT_NAMES}
+        if n_resamples > 0:
+            parts = [bootstrap_return_stats(codes[rows], returns[rows, i:i + 1], len(labels), n_resamples,
+                                            block_lengths=[periods[i]], seed=seed)
+                     for i, rows in enumerate(kept)]
+            intervals = {name: tuple(np.hstack([part[name][bound] for part in parts]) for bound in range(2))
+                         for name in parts[0]}
     
     results = {}
-    for i, period in enumerate(periods):
+    for i, period_name in enumerate(period_names):
         returns_by_category = {}
-        for category in labels:
-            category_returns = data[data['VIX_category'] == category][f'SP500_{period}d_return']
-            if len(category_returns) > 0:
-                returns_by_category[category] = {
-                    'mean': category_returns.mean(),
-                    'median': category_returns.median(),
-                    'min': category_returns.min(),
-                    'max': category_returns.max(),
-                    'positive_prob': (category_returns > 0).mean(),
-                    'count': len(category_returns)
-                }
-        results[period_names[i]] = returns_by_category
+        for j, category in enumerate(labels):
+            if stats['count'][j, i] > 0:
+                returns_by_category[category] = {name: stats[name][j, i] for name in STAT_NAMES}
+                if n_resamples > 0:
+                    for name, (low, high) in intervals.items():
+                        returns_by_category[category][f'{name}_ci'] = (low[j, i], high[j, i])
+        results[period_name] = returns_by_category
     
     return results
 
-def plot_vix_sp500_relationship(data):
-    """Plot VIX and SP500 relationship"""
-    print("Plotting VIX and SP500 relationship...")
-    
-    fig, axes = plt.subplots(2, 1, figsize=(16, 12), gridspec_kw={'height_ratios': [2, 1]})
-    fig.patch.set_facecolor(COLORS['background'])
-    
-    # Upper plot: SP500 and VIX time series
-    ax1 = axes[0]
-    ax1.set_facecolor(COLORS['background'])
-    ax1.plot(data.index, data['SP500'], color=COLORS['primary'], label='S&P 500 Index', linewidth=2)
-    ax1.set_ylabel('S&P 500 Index', color=COLORS['primary'], fontsize=14, fontweight='bold')
-    ax1.tick_params(axis='y', labelcolor=COLORS['primary'])
-    
-    # Mark VIX peaks
-    peak_dates = data[data['is_local_peak']].index
-    for date in peak_dates:
-        ax1.axvline(x=date, color=COLORS['secondary'], linestyle='--', alpha=0.3)
-    
-    ax2 = ax1.twinx()
-    ax2.plot(data.index, data['VIX'], color=COLORS['secondary'], label='VIX Fear Index', linewidth=2)
-    ax2.fill_between(data.index, data['VIX'], color=COLORS['secondary'], alpha=0.1)
-    ax2.set_ylabel('VIX Fear Index', color=COLORS['secondary'], fontsize=14, fontweight='bold')
-    ax2.tick_params(axis='y', labelcolor=COLORS['secondary'])
-    
-    # Add legend
-    lines1, labels1 = ax1.get_legend_handles_labels()
-    lines2, labels2 = ax2.get_legend_handles_labels()
-    ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left', frameon=True, facecolor='white')
-    
-    # Lower plot: Scatter plot of future 1-year returns when VIX > 30
-    ax3 = axes[1]
-    ax3.set_facecolor(COLORS['background'])
-    high_vix = data[data['VIX'] > 30].copy()
-    scatter = ax3.scatter(high_vix.index, high_vix['SP500_250d_return'], 
-                        c=high_vix['VIX'], cmap='YlOrRd', 
-                        s=high_vix['VIX']*2, alpha=0.7)
-    
-    ax3.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
-    ax3.set_ylabel('Future 1-Year Return', fontsize=14, fontweight='bold')
-    ax3.yaxis.set_major_formatter(PercentFormatter(1.0))
-    
-    # Add colorbar with custom styling
-    cbar = plt.colorbar(scatter, ax=ax3, label='VIX Value')
-    cbar.ax.set_ylabel('VIX Value', fontsize=12, fontweight='bold')
-    
-    plt.suptitle('VIX Fear Index and S&P 500 Index Relationship Analysis', 
-                fontsize=20, fontweight='bold', y=0.95)
-    plt.tight_layout()
-    plt.savefig(os.path.join('result', 'vix_sp500_relationship.png'), dpi=300, bbox_inches='tight', facecolor=COLORS['background'])
-    plt.close()
+def generate_report(data, recovery_df, return_results, correlations=None):
+    """Generate analysis report
 
-def plot_recovery_analysis(recovery_df):
-    """Plot recovery time analysis"""
-    print("Plotting recovery time analysis...")
-    
-    if len(recovery_df) == 0:
-        print("Insufficient data for recovery time analysis")
-        return
-        
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    fig.patch.set_facecolor(COLORS['background'])
-    axes = axes.flatten()
-    
-    # 1. VIX vs Maximum Drawdown
-    ax1 = axes[0]
-    ax1.set_facecolor(COLORS['background'])
-    scatter = ax1.scatter(recovery_df['vix_value'], recovery_df['drawdown'], 
-                         s=100, alpha=0.7, color=COLORS['secondary'])
-    ax1.set_xlabel('VIX Peak Value', fontsize=14, fontweight='bold')
-    ax1.set_ylabel('Maximum Drawdown', fontsize=14, fontweight='bold')
-    ax1.yaxis.set_major_formatter(PercentFormatter(1.0))
-    
-    # Add trend line
-    z = np.polyfit(recovery_df['vix_value'], recovery_df['drawdown'], 1)
-    p = np.poly1d(z)
-    ax1.plot(recovery_df['vix_value'], p(recovery_df['vix_value']), 
-             color=COLORS['primary'], linestyle='--', alpha=0.7, linewidth=2)
-    
-    # Calculate correlation
-    corr = np.corrcoef(recovery_df['vix_value'], recovery_df['drawdown'])[0, 1]
-    ax1.set_title(f'VIX Peak vs Maximum Drawdown\n(Correlation: {corr:.2f})', 
-                 fontsize=16, fontweight='bold', pad=20)
-
-    # 2. VIX vs Recovery Time
-    ax2 = axes[1]
-    ax2.set_facecolor(COLORS['background'])
-    scatter = ax2.scatter(recovery_df['vix_value'], recovery_df['recovery_days'], 
-                         s=100, alpha=0.7, color=COLORS['secondary'])
-    ax2.set_xlabel('VIX Peak Value', fontsize=14, fontweight='bold')
-    ax2.set_ylabel('Recovery Days', fontsize=14, fontweight='bold')
-    
-    # Add trend line
-    z = np.polyfit(recovery_df['vix_value'], recovery_df['recovery_days'], 1)
-    p = np.poly1d(z)
-    ax2.plot(recovery_df['vix_value'], p(recovery_df['vix_value']), 
-             color=COLORS['primary'], linestyle='--', alpha=0.7, linewidth=2)
-    
-    # Calculate correlation
-    corr = np.corrcoef(recovery_df['vix_value'], recovery_df['recovery_days'])[0, 1]
-    ax2.set_title(f'VIX Peak vs Recovery Time\n(Correlation: {corr:.2f})', 
-                 fontsize=16, fontweight='bold', pad=20)
-    
-    # 3. Maximum Drawdown vs Recovery Time
-    ax3 = axes[2]
-    ax3.set_facecolor(COLORS['background'])
-    scatter = ax3.scatter(recovery_df['drawdown'], recovery_df['recovery_days'], 
-                         s=100, alpha=0.7, color=COLORS['secondary'])
-    ax3.set_xlabel('Maximum Drawdown', fontsize=14, fontweight='bold')
-    ax3.set_ylabel('Recovery Days', fontsize=14, fontweight='bold')
-    ax3.xaxis.set_major_formatter(PercentFormatter(1.0))
-    
-    # Add trend line
-    z = np.polyfit(recovery_df['drawdown'], recovery_df['recovery_days'], 1)
-    p = np.poly1d(z)
-    ax3.plot(recovery_df['drawdown'], p(recovery_df['drawdown']), 
-             color=COLORS['primary'], linestyle='--', alpha=0.7, linewidth=2)
-    
-    # Calculate correlation
-    corr = np.corrcoef(recovery_df['drawdown'], recovery_df['recovery_days'])[0, 1]
-    ax3.set_title(f'Maximum Drawdown vs Recovery Time\n(Correlation: {corr:.2f})', 
-                 fontsize=16, fontweight='bold', pad=20)
-    
-    # 4. Recovery Days Timeline
-    ax4 = axes[3]
-    ax4.set_facecolor(COLORS['background'])
-    bars = ax4.bar(recovery_df['peak_date'].astype(str), recovery_df['recovery_days'], 
-                   alpha=0.7, color=COLORS['primary'])
-    
-    # Add VIX value labels to each bar
-    for i, bar in enumerate(bars):
-        height = bar.get_height()
-        vix_value = recovery_df['vix_value'].iloc[i]
-        ax4.text(bar.get_x() + bar.get_width()/2., height + 5,
-                f'VIX:{vix_value:.1f}', ha='center', va='bottom', 
-                rotation=45, fontsize=8, color=COLORS['secondary'])
-    
-    ax4.set_xticklabels(recovery_df['peak_date'].dt.strftime('%Y-%m-%d'), 
-                       rotation=45, ha='right')
-    ax4.set_ylabel('Recovery Days', fontsize=14, fontweight='bold')
-    ax4.set_title('Market Recovery Time After Historical VIX Peaks', 
-                 fontsize=16, fontweight='bold', pad=20)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join('result', 'vix_recovery_analysis.png'), dpi=300, bbox_inches='tight', 
-                facecolor=COLORS['background'])
-    plt.close()
-
-def plot_future_returns_by_vix(results):
-    """Plot future returns by VIX levels"""
-    print("Plotting future returns by VIX levels...")
-    
-    periods = list(results.keys())
-    categories = ['<20', '20-30', '30-40', '40-50', '>50']
-    
-    # Prepare data
-    mean_returns = {}
-    for period in periods:
-        mean_returns[period] = []
-        for category in categories:
-            if category in results[period]:
-                mean_returns[period].append(results[period][category]['mean'])
-            else:
-                mean_returns[period].append(np.nan)
-    
-    # Create figure with correct size
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    fig.patch.set_facecolor(COLORS['background'])
-    axes = axes.flatten()
-    
-    # 1. Average future returns by VIX level (by period)
-    for i, period in enumerate(periods[:4]):  # Use first 4 periods
-        ax = axes[i]
-        ax.set_facecolor(COLORS['background'])
-        bars = ax.bar(categories, mean_returns[period], alpha=0.7, color=COLORS['primary'])
-        
-        # Add value labels inside bars
-        for bar in bars:
-            height = bar.get_height()
-            if not np.isnan(height):
-                # Set label color
-                color = 'white' #if abs(height) > 0.1 else COLORS['neutral']
-                # Set label position
-                if height > 0:
-                    y_pos = height / 2  # Positive value in bar middle
-                else:
-                    y_pos = height / 2  # Negative value in bar middle
-                
-                ax.text(bar.get_x() + bar.get_width()/2., y_pos,
-                       f'{height:.1%}', ha='center', va='center',
-                       color=color, fontweight='bold', fontsize=10)
-        
-        ax.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
-        ax.set_title(f'VIX Level vs Future {period} Return', 
-                   fontsize=16, fontweight='bold', pad=20)
-        ax.set_ylabel('Average Return', fontsize=14, fontweight='bold')
-        ax.set_xlabel('VIX Range', fontsize=14, fontweight='bold')
-        ax.yaxis.set_major_formatter(PercentFormatter(1.0))
-        
-        # Adjust y-axis range to ensure enough space for label
-        y_min, y_max = ax.get_ylim()
-        ax.set_ylim(y_min * 1.1, y_max * 1.1)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join('result', 'vix_future_returns.png'), dpi=300, bbox_inches='tight', 
-                facecolor=COLORS['background'])
-    plt.close()
-    
-    # 2. Return comparison across periods (by VIX level)
-    plt.figure(figsize=(16, 10))
-    plt.gca().set_facecolor(COLORS['background'])
-    
-    bar_width = 0.15
-    index = np.arange(len(categories))
-    
-    colors = [COLORS['primary'], COLORS['secondary'], COLORS['accent'], 
-             COLORS['success'], COLORS['neutral']]
-    
-    # Draw bar chart and add labels
-    for i, period in enumerate(periods[:5]):  # Use first 5 periods
-        values = mean_returns[period]
-        bars = plt.bar(index + i*bar_width, values, bar_width, alpha=0.7, 
-                label=period, color=colors[i % len(colors)])
-        
-        # Add labels inside bars
-        for bar in bars:
-            height = bar.get_height()
-            if not np.isnan(height):
-                # Set label color
-                color = 'white' if abs(height) > 0.1 else COLORS['neutral']
-                # Set label position
-                if height > 0:
-                    y_pos = height / 2  # Positive value in bar middle
-                else:
-                    y_pos = height / 2  # Negative value in bar middle
-                
-                plt.text(bar.get_x() + bar.get_width()/2., y_pos,
-                        f'{height:.1%}', ha='center', va='center',
-                        color=color, fontweight='bold', fontsize=8)
-    
-    plt.axhline(y=0, color=COLORS['neutral'], linestyle='-', alpha=0.3)
-    plt.xlabel('VIX Range', fontsize=16, fontweight='bold')
-    plt.ylabel('Average Return', fontsize=16, fontweight='bold')
-    plt.title('Future Returns Comparison Across Different VIX Levels', 
-             fontsize=20, fontweight='bold', pad=20)
-    plt.xticks(index + bar_width * 2, categories, fontsize=12)
-    plt.legend(fontsize=12, frameon=True, facecolor='white')
-    plt.grid(axis='y', alpha=0.3, color=COLORS['grid'])
-    plt.gca().yaxis.set_major_formatter(PercentFormatter(1.0))
-    
-    # Adjust y-axis range
-    y_min, y_max = plt.gca().get_ylim()
-    plt.ylim(y_min * 1.1, y_max * 1.1)
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join('result', 'vix_future_returns_comparison.png'), dpi=300, bbox_inches='tight', 
-                facecolor=COLORS['background'])
-    plt.close()
-
-def generate_report(data, recovery_df, return_results):
-    """Generate analysis report"""
+    `correlations` (from rolling_correlations) adds a table of the rolling
+    correlation and beta windows.
+    """
     print("Generating analysis report...")
     
     # 1. Create report summary
     report = "# VIX Fear Index Analysis Report\n\n"
     report += "## 1. Analysis Summary\n"
     report += f"* Analysis Period: {data.index.min().strftime('%Y-%m-%d')} to {data.index.max().strftime('%Y-%m-%d')}\n"
-    report += f"* Identified VIX Peak Count: {len(data[data['is_local_peak']])}\n"
-    report += f"* VIX Historical Maximum Value: {data['VIX'].max():.2f}, Occurred on {data['VIX'].idxmax().strftime('%Y-%m-%d')}\n\n"
+    report += f"* Identified VIX Peak Count: {int(data['is_local_peak'].sum())}\n"
+    report += f"* VIX Historical Maximum Value: {data['VIX'].max():.2f}, Occurred on {data['VIX'].idxmax().strftime('%Y-%m-%d')}\n"
+    if 'SP500_garman_klass_vol' in data:
+        report += f"* VIX Historical Maximum Intraday High: {data['VIX_high'].max():.2f}, Occurred on {data['VIX_high'].idxmax().strftime('%Y-%m-%d')}\n"
+        report += f"* S&P 500 {RANGE_VOL_WINDOW}-Day Range Volatility (Parkinson / Garman-Klass): average {data['SP500_parkinson_vol'].mean():.2f} / {data['SP500_garman_klass_vol'].mean():.2f}, against an average VIX of {data['VIX'].mean():.2f}\n"
+    report += "\n"
     
     # 2. VIX and S&P 500 Index Correlation
     corr = data[['VIX', 'SP500']].corr().iloc[0, 1]
@@ -443,6 +215,17 @@ def generate_report(data, recovery_df, return_results):
     report += f"* VIX and S&P 500 Index Correlation Coefficient: {corr:.4f}\n"
     report += "* Correlation Interpretation: VIX and stock market usually show negative correlation, when VIX rises, stock market usually falls.\n\n"
     
+    # Rolling correlation and beta (VIX move per S&P 500 move) by window
+    if correlations is not None:
+        summary = correlation_summary(correlations)
+        report += "### Rolling Correlation and Beta\n"
+        report += "| Basis | Window (Days) | Latest Correlation | Average Correlation | Minimum Correlation | Maximum Correlation | Latest Beta | Average Beta |\n"
+        report += "|-------|---------------|--------------------|---------------------|---------------------|---------------------|-------------|--------------|\n"
+        for row in summary.itertuples(index=False):
+            basis = 'Price levels' if row.basis == 'level' else 'Daily returns'
+            report += f"| {basis} | {row.window} | {row.latest_corr:.4f} | {row.mean_corr:.4f} | {row.min_corr:.4f} | {row.max_corr:.4f} | {row.latest_beta:.4f} | {row.mean_beta:.4f} |\n"
+        report += "* Beta: VIX points per S&P 500 point on price levels, VIX % change per 1% S&P 500 move on daily returns.\n\n"
+    
     # 3. Stock Market Performance After VIX Peaks
     if len(recovery_df) > 0:
         report += "## 3. Stock Market Performance After VIX Peaks\n"
@@ -465,12 +248,22 @@ def generate_report(data, recovery_df, return_results):
     report += "## 4. Future Returns by VIX Levels\n"
     
     for period, period_results in return_results.items():
+        # Bootstrap intervals, when analyze_future_returns computed them
+        with_ci = any('mean_ci' in stats for stats in period_results.values())
         report += f"### {period} Future Returns\n"
-        report += "| VIX Range | Average Return | Median Return | Minimum Return | Maximum Return | Positive Return Probability | Sample Count |\n"
-        report += "|-----------|--------------|--------------|--------------|--------------|----------------------------|-------------|\n"
+        if with_ci:
+            report += "| VIX Range | Average Return | Average Return 95% CI | Median Return | Median Return 95% CI | Minimum Return | Maximum Return | Positive Return Probability | Positive Return Probability 95% CI | Sample Count |\n"
+            report += "|-----------|--------------|---------------------|--------------|--------------------|--------------|--------------|----------------------------|----------------------------------|-------------|\n"
+        else:
+            report += "| VIX Range | Average Return | Median Return | Minimum Return | Maximum Return | Positive Return Probability | Sample Count |\n"
+            report += "|-----------|--------------|--------------|--------------|--------------|----------------------------|-------------|\n"
         
         for category, stats in period_results.items():
-            report += f"| {category} | {stats['mean']:.2%} | {stats['median']:.2%} | {stats['min']:.2%} | {stats['max']:.2%} | {stats['positive_prob']:.2%} | {stats['count']} |\n"
+            if with_ci:
+                ci = {name: f"{stats[f'{name}_ci'][0]:.2%} to {stats[f'{name}_ci'][1]:.2%}" for name in BOOTSTRAP_STATS}
+                report += f"| {category} | {stats['mean']:.2%} | {ci['mean']} | {stats['median']:.2%} | {ci['median']} | {stats['min']:.2%} | {stats['max']:.2%} | {stats['positive_prob']:.2%} | {ci['positive_prob']} | {stats['count']} |\n"
+            else:
+                report += f"| {category} | {stats['mean']:.2%} | {stats['median']:.2%} | {stats['min']:.2%} | {stats['max']:.2%} | {stats['positive_prob']:.2%} | {stats['count']} |\n"
         
         report += "\n"
     
@@ -511,34 +304,126 @@ def generate_report(data, recovery_df, return_results):
     
     return report
 
-def main():
-    """Main function"""
-    print("Starting VIX Fear Index Analysis...")
-    
-    # Load data
-    data = load_data()
-    
-    # Identify VIX peaks
-    data = identify_vix_peaks(data)
-    
-    # Calculate recovery time
-    recovery_df = calculate_recovery_time(data)
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='VIX Fear Index Analysis')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute all features instead of using the on-disk data cache')
+    # Ways of building the analysis frame, one at a time
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--stream', action='store_true',
+                      help='Read the CSV files in chunks with float32 columns (long intraday histories)')
+    mode.add_argument('--compact', action='store_true',
+                      help='Keep the analysis frame in a memory-compact layout (float32 features)')
+    mode.add_argument('--lazy', action='store_true',
+                      help='Compute only the features the analysis uses, keeping rows without forward returns')
+    mode.add_argument('--incremental', action='store_true',
+                      help='Only ingest rows appended to the CSV files since the last incremental run')
+    parser.add_argument('--ohlc', action='store_true',
+                        help='Find peaks on the VIX daily high and drawdowns on the S&P 500 intraday low '
+                             '(only with --lazy or on its own)')
+    parser.add_argument('--preview', action='store_true',
+                        help=f'Render charts quickly at {PREVIEW_DPI} dpi')
+    parser.add_argument('--no-plots', action='store_true',
+                        help='Skip chart rendering (headless batch jobs)')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='Add block bootstrap confidence intervals from N resamples to the report')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the bootstrap resamples')
+    parser.add_argument('--profile', action='store_true',
+                        help='Also trace allocations and dump cProfile and tracemalloc details of the slowest stage')
+    args = parser.parse_args(argv)
+    if args.ohlc and (args.stream or args.compact or args.incremental):
+        parser.error('--ohlc can only be combined with --lazy')
+    return args
+
+def _run_stages(args):
+    """Run the pipeline stages
+
+    Returns (drawn, unchanged), the chart files redrawn and those skipped
+    because their data is unchanged (both empty with --no-plots), or None
+    when there is nothing to update.
+    """
+    if args.incremental:
+        # Update the saved state with the new rows only
+        print("Updating saved analysis state with new data...")
+        with profiling.stage('incremental update'):
+            data, recovery_df, info = incremental.update(os.path.join(DATA_DIR, '^vix.csv'),
+                                                         os.path.join(DATA_DIR, '^GSPC.csv'))
+        print(f"New rows: {info['new_rows']}, rows awaiting future returns: {info['pending_rows']}")
+        if info['new_rows'] == 0:
+            print("No new data, report and charts are up to date.")
+            return None
+    else:
+        # Load data
+        with profiling.stage('load'):
+            data = load_data(use_cache=not args.no_cache, stream=args.stream, compact=args.compact,
+                             lazy=args.lazy, ohlc=args.ohlc)
+        
+        # Identify VIX peaks
+        with profiling.stage('peaks'):
+            data = identify_vix_peaks(data, ohlc=args.ohlc)
+        
+        # Calculate recovery time
+        with profiling.stage('recovery'):
+            recovery_df = calculate_recovery_time(data, ohlc=args.ohlc)
     
     # Analyze future returns
-    return_results = analyze_future_returns(data)
-    
-    # Plot charts
-    plot_vix_sp500_relationship(data)
-    if len(recovery_df) > 0:
-        plot_recovery_analysis(recovery_df)
-    plot_future_returns_by_vix(return_results)
+    with profiling.stage('returns'):
+        return_results = analyze_future_returns(data, n_resamples=args.bootstrap, seed=args.seed)
+    
+    # Rolling correlations and betas
+    with profiling.stage('correlation'):
+        correlations = rolling_correlations(data)
+    
+    # Plot charts in parallel, skipping those whose data is unchanged
+    drawn, unchanged = [], []
+    if not args.no_plots:
+        jobs = [(plot_vix_sp500_relationship,
+                 (data[['VIX', 'SP500', 'is_local_peak', 'SP500_250d_return']],
+                  correlations[list(CHART_CORRELATIONS)]),
+                 [os.path.join('result', 'vix_sp500_relationship.png')])]
+        if len(recovery_df) > 0:
+            jobs.append((plot_recovery_analysis, (recovery_df,),
+                         [os.path.join('result', 'vix_recovery_analysis.png')]))
+        jobs.append((plot_future_returns_by_vix, (return_results,),
+                     [os.path.join('result', 'vix_future_returns.png'),
+                      os.path.join('result', 'vix_future_returns_comparison.png')]))
+        with profiling.stage('plots'):
+            rendered = render_charts(jobs, dpi=PREVIEW_DPI if args.preview else FULL_DPI)
+        for function, _, outputs in jobs:
+            (drawn if function in rendered else unchanged).extend(outputs)
     
     # Generate report
-    report = generate_report(data, recovery_df, return_results)
-    
-    print("\nAnalysis Completed! Report and charts saved.")
+    with profiling.stage('report'):
+        generate_report(data, recovery_df, return_results, correlations)
+    return drawn, unchanged
+
+def main(argv=None):
+    """Main function"""
+    args = parse_args(argv)
+    print("Starting VIX Fear Index Analysis...")
+    profiler = profiling.Profiler(detailed=args.profile).start()
+    try:
+        charts = _run_stages(args)
+        if charts is None:
+            return
+    finally:
+        profiler.stop()
+    
+    # Stage timings go next to the report
+    slowest = profiler.write('result')
+    print("Stage profile: result/profile.json, result/profile.csv")
+    if args.profile and slowest is not None:
+        print(f"Slowest stage '{slowest}' details: result/profile_slowest.txt, result/profile_slowest.prof")
+    drawn, unchanged = charts
+    print(f"\nAnalysis Completed! Report{' and charts' if drawn else ''} saved.")
     print("Report file: result/vix_analysis_report.md")
-    print("Chart files: result/vix_sp500_relationship.png, result/vix_recovery_analysis.png, result/vix_future_returns.png, result/vix_future_returns_comparison.png")
+    if drawn:
+        print(f"Chart files: {', '.join(path.replace(os.sep, '/') for path in drawn)}")
+    if unchanged:
+        print(f"Charts unchanged, not redrawn: {', '.join(path.replace(os.sep, '/') for path in unchanged)}")
+    if args.no_plots:
+        print("Charts skipped (--no-plots)")
 
 if __name__ == "__main__":
     main()
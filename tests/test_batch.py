@@ -0,0 +1,10 @@
+import pytest
+
+from batch import read_manifest
+
+
+def test_duplicate_pair_names_are_rejected(tmp_path):
+    path = tmp_path / 'pairs.csv'
+    path.write_text('name,vol_path,equity_path\nVIX/SPX,vix.csv,gspc.csv\nVIX/SPX,vix2.csv,gspc2.csv\n')
+    with pytest.raises(ValueError, match='VIX/SPX'):
+        read_manifest(path)
@@ -0,0 +1,28 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import BOOTSTRAP_STATS, bootstrap_return_stats
+from vix_index import analyze_future_returns
+
+
+def test_no_rows_give_nan_intervals():
+    intervals = bootstrap_return_stats(np.zeros(0, dtype=np.int64), np.zeros((0, 2)), 3, n_resamples=10, workers=1)
+    for name in BOOTSTRAP_STATS:
+        low, high = intervals[name]
+        assert low.shape == high.shape == (3, 2)
+        assert np.isnan(low).all() and np.isnan(high).all()
+
+
+def test_horizon_longer_than_the_data():
+    n = 40
+    data = pd.DataFrame({'VIX': np.full(n, 25.0), 'SP500': 100 + np.arange(n, dtype=float)},
+                        index=pd.bdate_range('2020-01-01', periods=n, name='date'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = analyze_future_returns(data, periods=[5, 100], period_names=['short', 'long'], n_resamples=10)
+    assert results['long'] == {}
+    assert results['short']['20-30']['count'] == n - 5
+    low, high = results['short']['20-30']['mean_ci']
+    assert low <= high
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from benchmark import synthetic_prices
+from correlation import rolling_corr_beta
+
+# Largest allowed difference from pandas' rolling corr, whose own rounding error is about 1e-7 here
+TOLERANCE = 1e-6
+
+
+def test_long_series_matches_pandas():
+    vix, sp500 = synthetic_prices(1_000_000, seed=1)
+    x, y = sp500['close'], vix['close']
+    windows = [20, 250]
+    corr, beta = rolling_corr_beta(x.to_numpy(), y.to_numpy(), windows)
+    for k, window in enumerate(windows):
+        expected = x.rolling(window).corr(y).to_numpy()
+        assert np.array_equal(np.isnan(corr[:, k]), np.isnan(expected))
+        assert np.nanmax(np.abs(corr[:, k] - expected)) < TOLERANCE
+        expected_beta = (x.rolling(window).cov(y) / x.rolling(window).var()).to_numpy()
+        assert np.nanmax(np.abs(beta[:, k] - expected_beta) / np.nanmax(np.abs(expected_beta))) < TOLERANCE
+
+
+def test_missing_values_and_pairs_match_pandas():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.standard_normal((10_000, 2)), axis=0) + 100
+    y = rng.standard_normal((10_000, 2)) + 0.3 * x
+    x[rng.random(x.shape) < 0.05] = np.nan
+    y[rng.random(y.shape) < 0.05] = np.nan
+    windows = [20, 500]
+    corr, _ = rolling_corr_beta(x, y, windows)
+    for pair in range(2):
+        for k, window in enumerate(windows):
+            expected = pd.Series(x[:, pair]).rolling(window).corr(pd.Series(y[:, pair])).to_numpy()
+            np.testing.assert_allclose(corr[:, pair, k], expected, rtol=0, atol=1e-9)
@@ -0,0 +1,8 @@
+from benchmark import DEFERRED_MODULES, IMPORT_BUDGET_S, check_import
+
+
+def test_import_is_fast_and_skips_the_plotting_stack():
+    # Fresh interpreters, best of a few runs; see benchmark.check_import
+    checks = check_import(repeat=3, budget=IMPORT_BUDGET_S)
+    assert checks['deferred_plotting_imports'], f"importing vix_index loaded one of {DEFERRED_MODULES}"
+    assert checks['import_time'], f"importing vix_index took longer than {IMPORT_BUDGET_S}s"
@@ -0,0 +1,34 @@
+import contextlib
+import io
+
+import pandas as pd
+
+import incremental
+from benchmark import synthetic_prices
+from vix_index import calculate_recovery_time, identify_vix_peaks, load_data
+
+
+def _lines(frame):
+    text = frame.to_csv(float_format='%.6f').encode()
+    header, _, body = text.partition(b'\n')
+    return header + b'\n', body.splitlines(keepends=True)
+
+
+def test_appending_step_by_step_matches_a_full_run(tmp_path):
+    vix, sp500 = synthetic_prices(3_000, seed=2)
+    # Dates with a VIX close but no S&P 500 close, before and inside the appended part
+    sp500 = sp500.drop(sp500.index[[1_700, 1_850, 1_990, 2_300, 2_600]])
+    vix_path, gspc_path, state_dir = tmp_path / 'vix.csv', tmp_path / 'gspc.csv', tmp_path / 'state'
+    (vix_header, vix_lines), (gspc_header, gspc_lines) = _lines(vix), _lines(sp500)
+
+    for end in [2_000, 2_200, 2_450, 2_700, 3_000]:
+        last = vix.index[end - 1]
+        vix_path.write_bytes(vix_header + b''.join(vix_lines[:end]))
+        gspc_path.write_bytes(gspc_header + b''.join(sp500_line for sp500_line, date in zip(gspc_lines, sp500.index)
+                                                    if date <= last))
+        with contextlib.redirect_stdout(io.StringIO()):
+            data, recovery_df, _ = incremental.update(str(vix_path), str(gspc_path), state_dir=str(state_dir))
+            expected = identify_vix_peaks(load_data(str(vix_path), str(gspc_path), use_cache=False))
+            expected_recovery = calculate_recovery_time(expected)
+        pd.testing.assert_frame_equal(data, expected, check_freq=False)
+        pd.testing.assert_frame_equal(recovery_df.reset_index(drop=True), expected_recovery.reset_index(drop=True))
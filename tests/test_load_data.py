@@ -0,0 +1,16 @@
+import pytest
+
+from vix_index import load_data, parse_args
+
+
+@pytest.mark.parametrize('modes', [{'stream': True, 'compact': True}, {'stream': True, 'lazy': True},
+                                   {'compact': True, 'lazy': True}, {'compact': True, 'ohlc': True}])
+def test_incompatible_modes_are_rejected(modes):
+    with pytest.raises(ValueError):
+        load_data(use_cache=False, **modes)
+
+
+def test_cli_rejects_two_modes():
+    with pytest.raises(SystemExit):
+        parse_args(['--stream', '--compact'])
+    assert parse_args(['--lazy', '--ohlc']).ohlc
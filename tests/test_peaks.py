@@ -0,0 +1,40 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+import reference
+from benchmark import synthetic_prices
+from peaks import peak_matrix
+from percentile_rank import expanding_percentile_rank
+from vix_index import identify_vix_peaks
+
+
+@pytest.fixture(scope='module')
+def data():
+    vix, sp500 = synthetic_prices(1_500, seed=4)
+    frame = sp500[['close']].rename(columns={'close': 'SP500'})
+    frame['VIX'] = vix['close'].round(0)  # whole points: ties between neighbouring rows
+    frame.iloc[[30, 31, 600, 1_200], frame.columns.get_loc('VIX')] = np.nan
+    frame['VIX_percentile_all'] = expanding_percentile_rank(frame['VIX'])
+    return frame
+
+
+@pytest.mark.parametrize('threshold, window', [(0.9, 20), (0.5, 5), (0.0, 1)])
+def test_peaks_match_reference(data, threshold, window):
+    with contextlib.redirect_stdout(io.StringIO()):
+        actual = identify_vix_peaks(data.copy(), threshold, window)
+    # Rows without a VIX value take no part in the peak search
+    expected = reference.identify_vix_peaks(data.dropna().copy(), threshold, window)
+    assert actual['is_local_peak'].sum() > 0
+    assert actual['is_local_peak'].equals(expected['is_local_peak'].reindex(data.index, fill_value=False))
+    assert actual['is_extreme_peak'].equals(data['VIX_percentile_all'] > 0.95)
+
+
+def test_peak_matrix_matches_reference(data):
+    complete = data.dropna()
+    flags = peak_matrix(complete, [0.8, 0.95], [5, 20])
+    for threshold, window in flags.columns:
+        expected = reference.identify_vix_peaks(complete.copy(), threshold, window)['is_local_peak']
+        assert flags[(threshold, window)].equals(expected.rename((threshold, window)))
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_prices
+from percentile_rank import (ExpandingPercentileRank, expanding_percentile_rank, extend_expanding_percentile_rank,
+                             rolling_percentile_rank)
+
+
+def _reference_rank(x):
+    # The rank reference.load_data takes of the last value in each window
+    return pd.Series(x).rank(pct=True).iloc[-1]
+
+
+@pytest.fixture(scope='module')
+def vix():
+    vix = synthetic_prices(1_500, seed=3)[0]['close'].round(0)  # whole points: many ties
+    vix.iloc[[0, 40, 41, 700, 1_499]] = np.nan
+    return vix
+
+
+@pytest.mark.parametrize('window', [1, 5, 250])
+def test_rolling_matches_reference(vix, window):
+    expected = vix.rolling(window).apply(_reference_rank)
+    pd.testing.assert_series_equal(rolling_percentile_rank(vix, window), expected, check_exact=False, rtol=1e-12)
+
+
+def test_expanding_matches_reference(vix):
+    expected = vix.expanding().apply(_reference_rank)
+    pd.testing.assert_series_equal(expanding_percentile_rank(vix), expected, check_exact=False, rtol=1e-12)
+
+
+def test_extended_and_chunked_ranks_match_expanding(vix):
+    expected = expanding_percentile_rank(vix)
+    pd.testing.assert_series_equal(extend_expanding_percentile_rank(vix.iloc[:900], vix.iloc[900:]),
+                                   expected.iloc[900:])
+    ranker = ExpandingPercentileRank()
+    chunks = [ranker.update(vix.iloc[start:start + 400].to_numpy()) for start in range(0, len(vix), 400)]
+    np.testing.assert_allclose(np.concatenate(chunks), expected.to_numpy(), rtol=1e-12)
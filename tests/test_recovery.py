@@ -0,0 +1,58 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reference
+from benchmark import synthetic_prices
+from percentile_rank import expanding_percentile_rank
+from recovery import recovery_events
+from vix_index import calculate_recovery_time, identify_vix_peaks
+
+
+def test_closes_trough_and_recovery():
+    prices = np.array([100.0, 101.0, 99.0, 98.0, 100.5, 102.0])
+    events = recovery_events(prices, [1], trough_lookahead=4, recovery_horizon=10)
+    assert events['trough_idx'].tolist() == [3]
+    assert events['recovery_idx'].tolist() == [5]
+    np.testing.assert_allclose(events['drawdown'], [98.0 / 101.0 - 1])
+
+
+def test_lows_ignore_the_peak_day_low():
+    # The peak day dipped to 90 before closing at 101; later lows stay above 97
+    prices = np.array([100.0, 101.0, 99.0, 100.5, 102.0])
+    lows = np.array([99.0, 90.0, 98.0, 97.0, 101.0])
+    events = recovery_events(prices, [1], trough_lookahead=3, recovery_horizon=10, lows=lows)
+    assert events['peak_idx'].tolist() == [1]
+    assert events['trough_idx'].tolist() == [3]
+    assert events['recovery_idx'].tolist() == [4]
+    np.testing.assert_allclose(events['drawdown'], [97.0 / 101.0 - 1])
+
+
+def test_lows_peak_on_last_row_is_dropped():
+    prices = np.array([100.0, 99.0, 101.0])
+    lows = np.array([99.0, 98.0, 90.0])
+    events = recovery_events(prices, [2], lows=lows)
+    assert len(events['peak_idx']) == 0
+
+
+@pytest.fixture(scope='module')
+def peaks():
+    vix, sp500 = synthetic_prices(3_000, seed=5)
+    data = sp500[['close']].rename(columns={'close': 'SP500'}).round(0)  # whole points: ties at troughs and recoveries
+    data['VIX'] = vix['close']
+    data.iloc[[100, 101, 1_500, 2_400], data.columns.get_loc('SP500')] = np.nan
+    data['VIX_percentile_all'] = expanding_percentile_rank(data['VIX'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        return identify_vix_peaks(data, percentile_threshold=0.5, window=10)
+
+
+def test_recovery_matches_reference(peaks):
+    with contextlib.redirect_stdout(io.StringIO()):
+        actual = calculate_recovery_time(peaks)
+    # Rows without an S&P 500 price take no part in the search
+    expected = reference.calculate_recovery_time(peaks.dropna())
+    assert len(expected) > 10
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True))
@@ -0,0 +1,49 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from benchmark import synthetic_prices
+from features import build_features
+from regime import RegimeIndex, parse_conditions
+from returns_stats import STAT_NAMES
+from vix_index import analyze_future_returns
+
+
+@pytest.fixture(scope='module')
+def data():
+    vix, sp500 = synthetic_prices(3_000, seed=7)
+    prices = vix[['close']].rename(columns={'close': 'VIX'}).round(0)  # ties at the condition bounds
+    prices['SP500'] = sp500['close']
+    # Recent rows keep NaN long-horizon returns, as with load_data(lazy=True)
+    return build_features(prices)
+
+
+def test_conditions_match_a_boolean_mask(data):
+    regimes = RegimeIndex(data)
+    conditions = 'VIX between 20 and 30 and VIX_20d_change > 10% and VIX_percentile_1y >= 0.5'
+    mask = ((data['VIX'] >= 20) & (data['VIX'] <= 30) & (data['VIX_20d_change'] > 0.1)
+            & (data['VIX_percentile_1y'] >= 0.5)).to_numpy()
+    assert mask.sum() > 20
+    np.testing.assert_array_equal(regimes.select(parse_conditions(conditions)), np.flatnonzero(mask))
+
+    periods = [20, 1250]
+    results = regimes.query(conditions, periods)
+    for period in periods:
+        returns = data[f'SP500_{period}d_return'].to_numpy()[mask]
+        returns = returns[~np.isnan(returns)]
+        stats = results[f'{period} days']
+        assert stats['count'] == len(returns)
+        assert stats['mean'] == pytest.approx(returns.mean(), rel=1e-12)
+        assert stats['median'] == pytest.approx(np.median(returns), rel=1e-12)
+        assert stats['positive_prob'] == pytest.approx((returns > 0).mean(), rel=1e-12)
+    # Short horizons keep the recent rows that have no 5-year return yet
+    assert results['20 days']['count'] > results['1250 days']['count']
+
+    # The same numbers as the report's return statistics on those rows
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = analyze_future_returns(data[mask].copy(), bins=[0, 1000], labels=['all'], periods=periods)
+    for period in periods:
+        for name in STAT_NAMES:
+            assert results[f'{period} days'][name] == pytest.approx(report[f'{period} days']['all'][name], rel=1e-12)
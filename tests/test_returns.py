@@ -0,0 +1,18 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from vix_index import analyze_future_returns
+
+
+def test_each_horizon_uses_the_rows_with_its_return():
+    n = 30
+    data = pd.DataFrame({'VIX': np.full(n, 25.0), 'SP500': 100 + np.arange(n, dtype=float)},
+                        index=pd.bdate_range('2020-01-01', periods=n, name='date'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = analyze_future_returns(data, periods=[2, 10], period_names=['short', 'long'])
+    assert results['short']['20-30']['count'] == n - 2
+    assert results['long']['20-30']['count'] == n - 10
+    assert results['short']['20-30']['positive_prob'] == 1.0
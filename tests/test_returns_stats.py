@@ -0,0 +1,52 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reference
+from benchmark import synthetic_prices
+from features import forward_returns
+from returns_stats import STAT_NAMES, VIX_BINS, bucket_codes, grouped_return_stats
+from vix_index import analyze_future_returns
+
+
+@pytest.fixture(scope='module')
+def data():
+    vix, sp500 = synthetic_prices(2_000, seed=6)
+    frame = pd.DataFrame({'VIX': vix['close'].round(0), 'SP500': sp500['close']})  # VIX on the bin edges too
+    return pd.concat([frame, forward_returns(frame['SP500'])], axis=1).dropna()
+
+
+def test_future_returns_match_reference(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        actual = analyze_future_returns(data.copy())
+    expected = reference.analyze_future_returns(data.copy())
+    assert actual.keys() == expected.keys()
+    for period, categories in expected.items():
+        assert actual[period].keys() == categories.keys()
+        for category, stats in categories.items():
+            for name in STAT_NAMES:
+                assert actual[period][category][name] == pytest.approx(stats[name], rel=1e-12), (period, category, name)
+
+
+def test_bucket_codes_match_cut():
+    values = np.array([-1.0, 0.0, 19.99, 20.0, 30.0, 49.5, 50.0, 99.9, 100.0, 150.0, np.nan])
+    expected = pd.cut(values, VIX_BINS, right=False).codes
+    np.testing.assert_array_equal(bucket_codes(values, VIX_BINS), expected)
+
+
+def test_grouped_stats_skip_nan_like_pandas():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(-1, 4, 500)
+    returns = np.round(rng.standard_normal((500, 3)), 1)  # ties for the medians
+    returns[rng.random(returns.shape) < 0.1] = np.nan
+    stats = grouped_return_stats(codes, returns, 4)
+    for bucket in range(4):
+        for horizon in range(3):
+            values = pd.Series(returns[codes == bucket, horizon])
+            expected = {'mean': values.mean(), 'median': values.median(), 'min': values.min(),
+                        'max': values.max(), 'positive_prob': (values > 0).mean(), 'count': len(values)}
+            for name in STAT_NAMES:
+                assert stats[name][bucket, horizon] == pytest.approx(expected[name], rel=1e-12)